@@ -1,14 +1,29 @@
 from models import KnowledgeGraph, Extraction, EnhancedCodeQuery
-from typing import List, Dict, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, Optional
 from datetime import date
 from app import aclient
-from repo_utils import create_knowledge_base
+from repo_utils import create_knowledge_base, stream_knowledge_base, iter_knowledge_base
+from chunk_store import ChunkStore
 from graph_utils import generate_graph
 import asyncio
+import itertools
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+EXTRACTION_WORKERS = 8
+QUEUE_SIZE = 32
+QUESTION_SIMILARITY = 0.75
+# Words that carry no topic, including the generic verbs follow-up questions
+# are phrased with ("how is X done / handled / implemented")
+QUESTION_STOPWORDS = frozenset("""
+a an and any are as at be been by can could do does done for from handle handled handles how
+implement implemented in into is it its of on or should that the their there these this those
+to used uses using was were what when where which who why will with work works would
+""".split())
+MIN_NOVELTY = 0.1
+
 async def extract_info(text_chunk: str, model: str) -> Optional[Extraction]:
     try:
         return await aclient.chat.completions.create(
@@ -26,6 +41,67 @@ async def extract_info(text_chunk: str, model: str) -> Optional[Extraction]:
         logger.error(f"Error in extract_info: {str(e)}")
         return None
 
+ExtractFn = Callable[[str, str], Awaitable[Optional[Extraction]]]
+
+async def limited(llm_slots: Optional[asyncio.Semaphore], fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+    """Await fn(*args) while holding one of llm_slots, or directly when there is no limit."""
+    if llm_slots is None:
+        return await fn(*args)
+    async with llm_slots:
+        return await fn(*args)
+
+async def stream_extractions(chunks: AsyncIterator[str], model: str, workers: int = EXTRACTION_WORKERS, queue_size: int = QUEUE_SIZE, extract_fn: ExtractFn = extract_info) -> AsyncIterator[Extraction]:
+    """Run extract_fn over a stream of chunks and yield results as they complete.
+
+    Chunks and results pass through bounded queues, so at most about
+    queue_size chunks are held in memory regardless of repository size.
+    """
+    chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    result_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    done = object()
+
+    async def produce():
+        try:
+            async for chunk in chunks:
+                await chunk_queue.put(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error reading chunks: {str(e)}")
+        for _ in range(workers):
+            await chunk_queue.put(done)
+
+    async def extract():
+        while True:
+            chunk = await chunk_queue.get()
+            if chunk is done:
+                break
+            try:
+                extraction = await extract_fn(chunk, model)
+            except Exception as e:
+                logger.error(f"Error in extraction: {str(e)}")
+                extraction = None
+            await result_queue.put(extraction)
+        # Every path except cancellation gets here; the consumer counts these
+        await result_queue.put(done)
+
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(extract()) for _ in range(workers)]
+    try:
+        finished = 0
+        while finished < workers:
+            extraction = await result_queue.get()
+            if extraction is done:
+                finished += 1
+            elif extraction is not None:
+                yield extraction
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def is_relevant(extraction: Extraction, query: str) -> bool:
+    return any(kw.lower() in query.lower() for kw in extraction.keywords)
+
 async def generate_follow_up_questions(analysis: str, model: str) -> List[str]:
     try:
         response = await aclient.chat.completions.create(
@@ -47,70 +123,140 @@ async def generate_follow_up_questions(analysis: str, model: str) -> List[str]:
         logger.error(f"Error in generate_follow_up_questions: {str(e)}")
         return []
 
-async def rag_analyze_repo(repo_path: str, enhanced_query: EnhancedCodeQuery, model: str, max_iterations: int = 3) -> Dict[str, str]:
-    knowledge_base = await create_knowledge_base(repo_path)
+def question_tokens(question: str) -> set:
+    """Content words of a question, lowercased and with a plural 's' stripped."""
+    words = re.findall(r"\w+", question.lower())
+    content = {w[:-1] if len(w) > 3 and w.endswith('s') and not w.endswith('ss') else w for w in words if w not in QUESTION_STOPWORDS}
+    return content or set(words)
+
+def dedup_questions(questions: List[str], asked: List[set], limit: int) -> List[str]:
+    """Return up to limit new questions, skipping ones too similar to questions already asked.
+
+    Blank lines and list numbering are stripped, and when the model wraps its
+    questions in prose only the lines containing a question mark are kept.
+    Similarity is the Jaccard index of the content words (see question_tokens);
+    asked is updated in place.
+    """
+    questions = [re.sub(r"^\s*(?:[-*]|\d+[.)])\s*", "", q).strip() for q in questions]
+    if any("?" in q for q in questions):
+        questions = [q for q in questions if "?" in q]
+    unique = []
+    for question in questions:
+        tokens = question_tokens(question)
+        if not tokens:
+            continue
+        if any(len(tokens & seen) / len(tokens | seen) >= QUESTION_SIMILARITY for seen in asked):
+            continue
+        asked.append(tokens)
+        unique.append(question)
+        if len(unique) == limit:
+            break
+    return unique
+
+async def answer_question(query: str, relevant_extractions: List[Extraction], enhanced_query: EnhancedCodeQuery, model: str) -> str:
+    context = "\n".join([f"Topic: {ext.topic}\nSummary: {ext.summary}" for ext in relevant_extractions])
+    response = await aclient.chat.completions.create(
+        model=model,
+        messages=[
+            {
+                "role": "system",
+                "content": f"You are an expert code analyst. Use the provided context to answer the question about the repository. Focus on the following aspects: {', '.join(enhanced_query.analysis_focus)}",
+            },
+            {
+                "role": "user",
+                "content": f"Context:\n{context}\n\nQuestion: {query}",
+            },
+        ],
+    )
+    return response.choices[0].message.content
+
+async def rag_analyze_repo(repo_path: str, enhanced_query: EnhancedCodeQuery, model: str, max_iterations: int = 3, knowledge_base: Optional[ChunkStore] = None, beam_width: int = 1, min_novelty: float = MIN_NOVELTY, extract_fn: ExtractFn = extract_info, llm_slots: Optional[asyncio.Semaphore] = None) -> Dict[str, str]:
+    """Answer the query, then explore follow-up questions for up to max_iterations rounds.
+
+    Each round answers up to beam_width questions concurrently. A round is
+    skipped, ending the exploration, when less than min_novelty of the
+    context it would retrieve has not already been used by earlier rounds.
+    extract_fn replaces extract_info, e.g. to share a cache between repos.
+    llm_slots, if given, bounds the answer and follow-up calls; extract_fn
+    is responsible for bounding its own calls.
+    """
+    if knowledge_base is None:
+        chunks = stream_knowledge_base(repo_path)
+    else:
+        chunks = iter_knowledge_base(knowledge_base)
+    # Extractions do not depend on the question, so they are computed once
+    # while streaming and reused for the follow-up rounds
+    extractions: List[Extraction] = []
+    retrieved = set()
+    asked: List[set] = []
     comprehensive_report = ""
-    follow_up_questions = []
+    iteration = 0
+    questions = [enhanced_query.rewritten_query]
     
-    for iteration in range(max_iterations):
-        if iteration == 0:
-            query = enhanced_query.rewritten_query
-        elif follow_up_questions:
-            query = follow_up_questions[0]  # Use the first follow-up question
-        else:
+    for depth in range(max_iterations):
+        questions = dedup_questions(questions, asked, beam_width)
+        if not questions:
             break  # No more questions to ask
         
         try:
-            # Use asyncio.gather to properly handle async operations
-            extraction_tasks = [extract_info(chunk, model) for chunk in knowledge_base]
-            extractions = await asyncio.gather(*extraction_tasks, return_exceptions=True)
+            relevant = {query: [] for query in questions}
+            if depth == 0:
+                # Filter extractions for relevance as they stream in
+                async for ext in stream_extractions(chunks, model, extract_fn=extract_fn):
+                    extractions.append(ext)
+                    for query in questions:
+                        if is_relevant(ext, query):
+                            relevant[query].append(len(extractions) - 1)
+            else:
+                for i, ext in enumerate(extractions):
+                    for query in questions:
+                        if is_relevant(ext, query):
+                            relevant[query].append(i)
             
-            # Filter out any failed extractions and log errors
-            valid_extractions = []
-            for i, ext in enumerate(extractions):
-                if isinstance(ext, Exception):
-                    logger.error(f"Error in extraction {i}: {str(ext)}")
-                else:
-                    valid_extractions.append(ext)
-            
-            relevant_extractions = [
-                ext for ext in valid_extractions
-                if ext and any(kw.lower() in query.lower() for kw in ext.keywords)
-            ]
-            
-            if not relevant_extractions:
-                logger.warning(f"No relevant extractions found for query: {query}")
-                comprehensive_report += f"\n\nIteration {iteration + 1}:\nQuestion: {query}\nAnalysis: No relevant information found.\n"
-                break
+            round_context = set().union(*relevant.values())
+            if depth > 0 and round_context:
+                novelty = len(round_context - retrieved) / len(round_context)
+                if novelty < min_novelty:
+                    logger.info(f"Stopping exploration at depth {depth}: only {novelty:.0%} new context")
+                    break
+            retrieved |= round_context
             
-            context = "\n".join([f"Topic: {ext.topic}\nSummary: {ext.summary}" for ext in relevant_extractions])
-            
-            response = await aclient.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"You are an expert code analyst. Use the provided context to answer the question about the repository. Focus on the following aspects: {', '.join(enhanced_query.analysis_focus)}",
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Context:\n{context}\n\nQuestion: {query}",
-                    },
-                ],
+            answered = [query for query in questions if relevant[query]]
+            analyses = await asyncio.gather(
+                *[limited(llm_slots, answer_question, query, [extractions[i] for i in relevant[query]], enhanced_query, model) for query in answered],
+                return_exceptions=True,
             )
-            
-            analysis = response.choices[0].message.content
-            comprehensive_report += f"\n\nIteration {iteration + 1}:\nQuestion: {query}\nAnalysis: {analysis}\n"
-            
-            if iteration < max_iterations - 1:
-                follow_up_questions = await generate_follow_up_questions(analysis, model)
+            results = dict(zip(answered, analyses))
         except Exception as e:
-            logger.error(f"Error in rag_analyze_repo iteration {iteration}: {str(e)}")
-            comprehensive_report += f"\n\nIteration {iteration + 1}:\nQuestion: {query}\nAnalysis: Error occurred during analysis.\n"
+            logger.error(f"Error in rag_analyze_repo round {depth}: {str(e)}")
+            for query in questions:
+                iteration += 1
+                comprehensive_report += f"\n\nIteration {iteration}:\nQuestion: {query}\nAnalysis: Error occurred during analysis.\n"
+            break
+        
+        successful = []
+        for query in questions:
+            iteration += 1
+            analysis = results.get(query)
+            if analysis is None:
+                logger.warning(f"No relevant extractions found for query: {query}")
+                analysis = "No relevant information found."
+            elif isinstance(analysis, Exception):
+                logger.error(f"Error answering question {query}: {str(analysis)}")
+                analysis = "Error occurred during analysis."
+            else:
+                successful.append(analysis)
+            comprehensive_report += f"\n\nIteration {iteration}:\nQuestion: {query}\nAnalysis: {analysis}\n"
+        
+        if depth == max_iterations - 1:
             break
+        follow_ups = await asyncio.gather(*[limited(llm_slots, generate_follow_up_questions, analysis, model) for analysis in successful])
+        # Interleave so every branch of the beam contributes to the next round
+        questions = [q for group in itertools.zip_longest(*follow_ups) for q in group if q is not None]
     
     return {"comprehensive_report": comprehensive_report}
 
-async def analyze_files(repo_path: str, model: str) -> KnowledgeGraph:
-    knowledge_base = await create_knowledge_base(repo_path)
+async def analyze_files(repo_path: str, model: str, knowledge_base: Optional[ChunkStore] = None) -> KnowledgeGraph:
+    if knowledge_base is None:
+        knowledge_base = await create_knowledge_base(repo_path)
     return await generate_graph(knowledge_base, model=model)
@@ -1,15 +1,22 @@
 from fastapi import APIRouter, HTTPException
-from models import AnalyzeRequest, ImproveRequest, GenerateSetupRequest, Program, File
+from models import AnalyzeRequest, BatchAnalyzeRequest, ImproveRequest, GenerateSetupRequest, ManifestSummary
 from repo_utils import clone_repo
+from manifest_utils import detect_manifests
 from analysis_utils import rag_analyze_repo
+from batch_utils import analyze_fleet
 from performance_utils import improve_repo_performance
 from query_understanding import expand_code_query
 from app import aclient
-import os
+from collections import OrderedDict
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+SETUP_SCRIPT_CACHE_SIZE = 128
+# Generated setup scripts keyed by (model, manifest digest)
+setup_script_cache: "OrderedDict[tuple, str]" = OrderedDict()
+
 router = APIRouter()
 
 @router.post("/analyze")
@@ -17,7 +24,7 @@ async def analyze(request: AnalyzeRequest):
     try:
         repo_path = await clone_repo(request.repo_url, "./temp_repo")
         enhanced_query = await expand_code_query(request.query, request.model)
-        analysis = await rag_analyze_repo(repo_path, enhanced_query, request.model)
+        analysis = await rag_analyze_repo(repo_path, enhanced_query, request.model, max_iterations=request.depth, beam_width=request.beam_width)
         if not analysis or 'comprehensive_report' not in analysis:
             logger.warning("rag_analyze_repo returned unexpected result")
             analysis = {"comprehensive_report": "Analysis failed to produce a comprehensive report."}
@@ -26,12 +33,29 @@ async def analyze(request: AnalyzeRequest):
         logger.error(f"Error during analysis: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An error occurred during analysis: {str(e)}")
 
+@router.post("/analyze-batch")
+async def analyze_batch(request: BatchAnalyzeRequest):
+    try:
+        fleet = await analyze_fleet(
+            request.repo_urls,
+            request.query,
+            request.model,
+            beam_width=request.beam_width,
+            depth=request.depth,
+            max_concurrent_repos=request.max_concurrent_repos,
+            max_concurrent_llm_calls=request.max_concurrent_llm_calls,
+        )
+        return {"fleet": fleet.model_dump(), "summary": fleet.summary()}
+    except Exception as e:
+        logger.error(f"Error during batch analysis: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An error occurred during batch analysis: {str(e)}")
+
 
 @router.post("/improve")
 async def improve(request: ImproveRequest):
     try:
         repo_path = await clone_repo(request.repo_url, "./temp_repo")
-        improvements = await improve_repo_performance(repo_path, request.model)
+        improvements = await improve_repo_performance(repo_path, request.model, request.profile_command, request.profile_timeout)
         return {"improvements": improvements}
     except Exception as e:
         logger.error(f"Error during improvement: {str(e)}")
@@ -41,24 +65,34 @@ async def improve(request: ImproveRequest):
 async def generate_setup(request: GenerateSetupRequest):
     try:
         repo_path = await clone_repo(request.repo_url, "./temp_repo")
-        program = Program(files=[File(file_name=f, body=open(os.path.join(repo_path, f), 'r').read()) for f in os.listdir(repo_path) if os.path.isfile(os.path.join(repo_path, f))])
-        script = await generate_setup_script(program, request.model)
+        # Hashing every manifest and lockfile is blocking file I/O
+        summary = await asyncio.to_thread(detect_manifests, repo_path)
+        key = (request.model, summary.digest())
+        script = setup_script_cache.get(key)
+        if script is None:
+            script = await generate_setup_script(summary, request.model)
+            setup_script_cache[key] = script
+            if len(setup_script_cache) > SETUP_SCRIPT_CACHE_SIZE:
+                setup_script_cache.popitem(last=False)
+        else:
+            logger.info("Using cached setup script for unchanged manifests")
+            setup_script_cache.move_to_end(key)
         return {"setup_script": script}
     except Exception as e:
         logger.error(f"Error during setup script generation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def generate_setup_script(program: Program, model: str) -> str:
+async def generate_setup_script(summary: ManifestSummary, model: str) -> str:
     response = await aclient.chat.completions.create(
         model=model,
         messages=[
             {
                 "role": "system",
-                "content": "You are an expert DevOps engineer. Generate a bash setup script for the given program files.",
+                "content": "You are an expert DevOps engineer. Generate a bash setup script for a repository described by a summary of its dependency and build manifests. Paths are relative to the repository root; manifests with parsed=false were detected but not read.",
             },
             {
                 "role": "user",
-                "content": f"Program files:\n{program.model_dump_json(indent=2)}\n\nGenerate a bash setup script:",
+                "content": f"Manifests:\n{summary.model_dump_json(exclude_defaults=True)}\n\nGenerate a bash setup script:",
             },
         ],
     )
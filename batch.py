@@ -0,0 +1,48 @@
+"""Analyze a fleet of repositories from the command line.
+
+Usage: python batch.py REPOS_FILE --query "..." [--output fleet.json]
+
+REPOS_FILE lists one repository URL per line; blank lines and lines starting
+with '#' are ignored.
+"""
+import argparse
+import asyncio
+from app import DEFAULT_MODEL
+from batch_utils import analyze_fleet, MAX_CONCURRENT_REPOS, MAX_CONCURRENT_LLM_CALLS
+
+
+def read_repo_urls(path: str) -> list:
+    with open(path, 'r') as f:
+        lines = [line.strip() for line in f]
+    return list(dict.fromkeys(line for line in lines if line and not line.startswith('#')))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyze many repositories with one query.")
+    parser.add_argument("repos_file", help="File with one repository URL per line")
+    parser.add_argument("--query", required=True, help="Question asked of every repository")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--beam-width", type=int, default=1)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--max-concurrent-repos", type=int, default=MAX_CONCURRENT_REPOS)
+    parser.add_argument("--max-concurrent-llm-calls", type=int, default=MAX_CONCURRENT_LLM_CALLS)
+    parser.add_argument("--output", default="fleet_report.json", help="Where to write the per-repo reports")
+    args = parser.parse_args()
+
+    fleet = asyncio.run(analyze_fleet(
+        read_repo_urls(args.repos_file),
+        args.query,
+        args.model,
+        beam_width=args.beam_width,
+        depth=args.depth,
+        max_concurrent_repos=args.max_concurrent_repos,
+        max_concurrent_llm_calls=args.max_concurrent_llm_calls,
+    ))
+    with open(args.output, "w") as f:
+        f.write(fleet.model_dump_json(indent=2))
+    print(fleet.summary())
+    print(f"Reports written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import re
+import time
+import shutil
+import asyncio
+import hashlib
+import logging
+import tempfile
+from collections import Counter
+from typing import Dict, List, Optional, Set
+from models import Extraction, EnhancedCodeQuery, RepoReport, FleetReport
+from repo_utils import clone_repo
+from analysis_utils import extract_info, limited, rag_analyze_repo
+from query_understanding import expand_code_query
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_REPOS = 4
+MAX_CONCURRENT_LLM_CALLS = 16
+
+class ExtractionCache:
+    """Extractions keyed by the hash of the chunk text, shared by all repositories in a batch.
+
+    Identical chunks (vendored libraries, copied modules, license and README
+    boilerplate) are extracted once, including when several repositories
+    reach the same chunk at the same time. Extraction calls hold one of
+    llm_slots, the batch's LLM concurrency budget, which the other model
+    calls of the batch share.
+    """
+
+    def __init__(self, max_concurrent_calls: int = MAX_CONCURRENT_LLM_CALLS):
+        self._results: Dict[str, Extraction] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._failed: Set[str] = set()
+        self.llm_slots = asyncio.Semaphore(max_concurrent_calls)
+        self.calls = 0
+
+    @property
+    def unique_chunks(self) -> int:
+        """Number of distinct chunks extraction was attempted for, whether or not it succeeded."""
+        return len(self._results) + len(self._failed)
+
+    async def extract(self, chunk: str, model: str, counter: Optional[Counter] = None) -> Optional[Extraction]:
+        key = hashlib.sha256(f"{model}\0{chunk}".encode('utf-8')).hexdigest()
+        if counter is not None:
+            counter['chunks'] += 1
+        if key in self._results:
+            result = self._results[key]
+        elif key in self._pending:
+            result = await asyncio.shield(self._pending[key])
+        else:
+            return await self._extract(key, chunk, model)
+        # Only a reused extraction saved a call; a shared failure did not
+        if result is not None and counter is not None:
+            counter['deduplicated'] += 1
+        return result
+
+    async def _extract(self, key: str, chunk: str, model: str) -> Optional[Extraction]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        result = None
+        try:
+            async with self.llm_slots:
+                self.calls += 1
+                result = await extract_info(chunk, model)
+            # Failed extractions are not cached so that later repositories retry them
+            if result is not None:
+                self._results[key] = result
+                self._failed.discard(key)
+            return result
+        finally:
+            if result is None:
+                self._failed.add(key)
+            future.set_result(result)
+            del self._pending[key]
+
+async def analyze_repo_in_batch(repo_url: str, clone_path: str, enhanced_query: EnhancedCodeQuery, model: str, cache: ExtractionCache, beam_width: int = 1, depth: int = 3) -> RepoReport:
+    report = RepoReport(repo_url=repo_url)
+    counter = Counter()
+    start = time.monotonic()
+
+    async def extract(chunk: str, model: str) -> Optional[Extraction]:
+        return await cache.extract(chunk, model, counter)
+
+    try:
+        repo_path = await clone_repo(repo_url, clone_path)
+        analysis = await rag_analyze_repo(repo_path, enhanced_query, model, max_iterations=depth, beam_width=beam_width, extract_fn=extract, llm_slots=cache.llm_slots)
+        report.comprehensive_report = analysis["comprehensive_report"]
+    except Exception as e:
+        logger.error(f"Error analyzing {repo_url}: {str(e)}")
+        report.error = str(e)
+    finally:
+        await asyncio.to_thread(shutil.rmtree, clone_path, True)
+    report.chunks = counter['chunks']
+    report.deduplicated_chunks = counter['deduplicated']
+    report.seconds = time.monotonic() - start
+    return report
+
+async def analyze_fleet(repo_urls: List[str], query: str, model: str, beam_width: int = 1, depth: int = 3, max_concurrent_repos: int = MAX_CONCURRENT_REPOS, max_concurrent_llm_calls: int = MAX_CONCURRENT_LLM_CALLS) -> FleetReport:
+    """Analyze many repositories with one query, sharing workers, LLM budget and extractions.
+
+    At most max_concurrent_repos repositories are cloned and analyzed at
+    once, and at most max_concurrent_llm_calls model calls of any kind are
+    in flight. Chunks with identical content are extracted only once across
+    the whole fleet, so cost grows with unique content rather than total content.
+    """
+    start = time.monotonic()
+    cache = ExtractionCache(max_concurrent_llm_calls)
+    enhanced_query = await limited(cache.llm_slots, expand_code_query, query, model)
+    repo_slots = asyncio.Semaphore(max_concurrent_repos)
+    workdir = tempfile.mkdtemp(prefix='forker-batch-')
+
+    async def run(index: int, repo_url: str) -> RepoReport:
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '-', repo_url.rstrip('/').split('/')[-1]) or "repo"
+        async with repo_slots:
+            logger.info(f"Analyzing repository {index + 1}/{len(repo_urls)}: {repo_url}")
+            return await analyze_repo_in_batch(repo_url, os.path.join(workdir, f"{index}-{name}"), enhanced_query, model, cache, beam_width, depth)
+
+    try:
+        reports = await asyncio.gather(*[run(i, url) for i, url in enumerate(repo_urls)])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    fleet = FleetReport(
+        repos=reports,
+        succeeded=sum(1 for r in reports if r.error is None),
+        failed=sum(1 for r in reports if r.error is not None),
+        total_chunks=sum(r.chunks for r in reports),
+        unique_chunks=cache.unique_chunks,
+        seconds=time.monotonic() - start,
+    )
+    logger.info(fleet.summary())
+    return fleet
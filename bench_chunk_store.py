@@ -0,0 +1,75 @@
+"""Compare peak RSS of the in-memory chunk list and the mmap-backed ChunkStore.
+
+Usage: python bench_chunk_store.py [repo_path]
+
+Each mode runs in its own subprocess so that ru_maxrss reflects only that mode.
+"""
+import os
+import sys
+import resource
+import subprocess
+from chunk_store import ChunkStore, CHUNK_SIZE
+
+ALLOWED_EXTENSIONS = ('.py', '.js', '.mdx', '.md', '.txt')
+
+
+def iter_files(repo_path: str):
+    for root, _, files in os.walk(repo_path):
+        for file in files:
+            if file.lower().endswith(ALLOWED_EXTENSIONS):
+                yield os.path.join(root, file)
+
+
+def build_list(repo_path: str) -> list:
+    knowledge_base = []
+    for file_path in iter_files(repo_path):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+                knowledge_base.extend(content[i:i+CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE))
+        except Exception:
+            pass
+    return knowledge_base
+
+
+def build_store(repo_path: str) -> ChunkStore:
+    store = ChunkStore()
+    for file_path in iter_files(repo_path):
+        try:
+            store.add_file(file_path)
+        except Exception:
+            pass
+    return store
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_mode(mode: str, repo_path: str) -> None:
+    baseline = peak_rss_mb()
+    chunks = build_list(repo_path) if mode == 'list' else build_store(repo_path)
+    # Touch every chunk once, as the extraction stage does
+    total = sum(len(chunk) for chunk in chunks)
+    print(f"{mode}\t{len(chunks)}\t{total}\t{baseline:.1f}\t{peak_rss_mb():.1f}")
+
+
+def main() -> None:
+    repo_path = sys.argv[1] if len(sys.argv) > 1 else '.'
+    print(f"Repository: {os.path.abspath(repo_path)}")
+    print("mode\tchunks\tchars\tbaseline_mb\tpeak_rss_mb")
+    for mode in ('list', 'store'):
+        result = subprocess.run(
+            [sys.executable, __file__, '--mode', mode, repo_path],
+            capture_output=True, text=True, check=True,
+        )
+        print(result.stdout.strip())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == '--mode':
+        run_mode(sys.argv[2], sys.argv[3])
+    else:
+        main()
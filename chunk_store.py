@@ -0,0 +1,128 @@
+import bisect
+import mmap
+import re
+import threading
+import logging
+from array import array
+from collections import OrderedDict
+from typing import Iterator, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+MAX_OPEN_MAPS = 32
+
+
+class ChunkStore:
+    """Read-only store of repository chunks backed by memory-mapped files.
+
+    Chunks are kept as (file id, byte offset, length) records in compact
+    arrays; the text of a chunk is only decoded when it is accessed. The
+    store behaves like a read-only sequence of strings, so it can be passed
+    to any stage that previously took the list built by create_knowledge_base
+    and shared between stages without copying.
+
+    Mapped pages count towards the resident set, so only the most recently
+    used max_open_maps files are kept mapped.
+    """
+
+    def __init__(self, max_open_maps: int = MAX_OPEN_MAPS):
+        self.paths: List[str] = []
+        self.max_open_maps = max_open_maps
+        self._file_ids = array('I')
+        self._offsets = array('Q')
+        self._lengths = array('I')
+        self._maps: "OrderedDict[int, mmap.mmap]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_file(self, file_path: str, chunk_size: int = CHUNK_SIZE) -> int:
+        """Index a UTF-8 file and return the number of chunks added.
+
+        Chunks hold chunk_size characters of the file as read in text mode,
+        i.e. with '\r\n' and '\r' translated to '\n', so they match the slices
+        of the former in-memory knowledge base. Files that are not valid UTF-8
+        raise UnicodeDecodeError and leave the store unchanged. Safe to call
+        from a worker thread while other threads read chunks.
+        """
+        with open(file_path, 'rb') as f:
+            raw = f.read().decode('utf-8')
+        spans = list(_split(raw, chunk_size))
+        del raw
+        with self._lock:
+            file_id = len(self.paths)
+            self.paths.append(file_path)
+            for offset, length in spans:
+                self._file_ids.append(file_id)
+                self._offsets.append(offset)
+                self._lengths.append(length)
+        return len(spans)
+
+    def location(self, index: int) -> Tuple[str, int, int]:
+        """Return (file path, byte offset, length) of the chunk at index."""
+        return self.paths[self._file_ids[index]], self._offsets[index], self._lengths[index]
+
+    def _map_locked(self, file_id: int) -> mmap.mmap:
+        mm = self._maps.get(file_id)
+        if mm is not None:
+            self._maps.move_to_end(file_id)
+            return mm
+        with open(self.paths[file_id], 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[file_id] = mm
+        while len(self._maps) > self.max_open_maps:
+            _, evicted = self._maps.popitem(last=False)
+            evicted.close()
+        return mm
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        with self._lock:
+            offset = self._offsets[index]
+            data = self._map_locked(self._file_ids[index])[offset:offset + self._lengths[index]]
+        return _translate_newlines(data.decode('utf-8'))
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self) -> None:
+        """Unmap all files. Chunks can still be read afterwards; files are remapped on demand."""
+        with self._lock:
+            for mm in self._maps.values():
+                mm.close()
+            self._maps.clear()
+
+    def __enter__(self) -> "ChunkStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _translate_newlines(text: str) -> str:
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _split(raw: str, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """Yield (byte offset, byte length) of each chunk_size-character chunk of raw.
+
+    Characters are counted after newline translation; each '\r\n' pair stays
+    in one chunk and counts as a single character.
+    """
+    # Positions of each '\r\n' pair in the translated text
+    crlf = [pos - i for i, pos in enumerate(m.start() for m in _CRLF.finditer(raw))]
+    translated_size = len(raw) - len(crlf)
+    start = byte_offset = 0
+    for boundary in range(chunk_size, translated_size + chunk_size, chunk_size):
+        boundary = min(boundary, translated_size)
+        end = boundary + bisect.bisect_left(crlf, boundary)
+        length = len(raw[start:end].encode('utf-8'))
+        yield byte_offset, length
+        start, byte_offset = end, byte_offset + length
+
+
+_CRLF = re.compile('\r\n')
@@ -0,0 +1,16 @@
+import sys
+import types
+
+# test.py is an end-to-end script against live repositories and the LLM API;
+# run it with `python test.py`, not pytest
+collect_ignore = ["test.py"]
+
+# app builds the LLM client at import time, which needs an API key and
+# initializes wandb. Unit tests never call the model, so they get a bare
+# module in its place; tests that need a client patch `aclient` themselves.
+if "app" not in sys.modules:
+    app = types.ModuleType("app")
+    app.aclient = None
+    app.DEFAULT_MODEL = "claude-3-5-sonnet-20240620"
+    app.app = None
+    sys.modules["app"] = app
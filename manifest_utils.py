@@ -0,0 +1,178 @@
+import os
+import re
+import ast
+import json
+import stat
+import hashlib
+import fnmatch
+import logging
+import configparser
+from typing import Any, Dict, Optional
+from models import Manifest, ManifestSummary
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+logger = logging.getLogger(__name__)
+
+MAX_MANIFEST_BYTES = 256 * 1024
+MAX_MANIFESTS = 200
+MAX_LIST_ITEMS = 100
+SKIP_DIRS = {'.git', 'node_modules', '.venv', 'venv', '__pycache__', '.tox', 'dist', 'build', 'site-packages'}
+
+LOCKFILES = {
+    'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml', 'poetry.lock', 'Pipfile.lock',
+    'uv.lock', 'pdm.lock', 'Cargo.lock', 'Gemfile.lock', 'composer.lock', 'go.sum',
+}
+
+def manifest_kind(filename: str) -> Optional[str]:
+    """Return the manifest kind for a file name, or None if it is not a manifest."""
+    if filename in LOCKFILES:
+        return 'lockfile'
+    if fnmatch.fnmatch(filename.lower(), 'requirements*.txt'):
+        return 'requirements'
+    if filename in ('pyproject.toml', 'setup.py', 'setup.cfg', 'package.json', 'Makefile'):
+        return filename
+    if filename == 'Dockerfile' or filename.startswith('Dockerfile.') or filename.endswith('.Dockerfile'):
+        return 'Dockerfile'
+    return None
+
+def detect_manifests(repo_path: str, max_bytes: int = MAX_MANIFEST_BYTES, max_manifests: int = MAX_MANIFESTS) -> ManifestSummary:
+    """Find and parse dependency and build manifests anywhere in the repository.
+
+    Files larger than max_bytes, binary files and lockfiles are recorded with
+    their hash and size only, without reading them into the summary. Only
+    regular files are read: symlinks, which may point outside the repository
+    or at devices, and other special files are skipped.
+    """
+    summary = ManifestSummary()
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for file in sorted(files):
+            kind = manifest_kind(file)
+            if kind is None:
+                continue
+            if len(summary.manifests) >= max_manifests:
+                logger.warning(f"Manifest limit of {max_manifests} reached, ignoring the rest")
+                return summary
+            file_path = os.path.join(root, file)
+            try:
+                if not stat.S_ISREG(os.lstat(file_path).st_mode):
+                    logger.info(f"Skipping manifest {file_path}: not a regular file")
+                    continue
+                summary.manifests.append(read_manifest(repo_path, file_path, kind, max_bytes))
+            except OSError as e:
+                logger.warning(f"Error reading manifest {file_path}: {str(e)}")
+    logger.info(f"Detected {len(summary.manifests)} manifests")
+    return summary
+
+def read_manifest(repo_path: str, file_path: str, kind: str, max_bytes: int) -> Manifest:
+    """Read at most max_bytes of a regular file; the hash covers only what was read."""
+    # O_NOFOLLOW guards against the file being swapped for a symlink after the check
+    fd = os.open(file_path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+    with open(fd, 'rb') as f:
+        st = os.fstat(f.fileno())
+        if not stat.S_ISREG(st.st_mode):
+            raise OSError(f"{file_path} is not a regular file")
+        head = f.read(max_bytes)
+    size = st.st_size
+    manifest = Manifest(path=os.path.relpath(file_path, repo_path), kind=kind, sha256=hashlib.sha256(head).hexdigest(), size=size)
+    if kind == 'lockfile' or size > max_bytes or b'\0' in head:
+        manifest.parsed = False
+        return manifest
+    try:
+        text = bytes(head).decode('utf-8')
+    except UnicodeDecodeError:
+        manifest.parsed = False
+        return manifest
+    try:
+        manifest.data = PARSERS[kind](text)
+    except Exception as e:
+        logger.warning(f"Error parsing manifest {file_path}: {str(e)}")
+        manifest.parsed = False
+    return manifest
+
+def _cap(items: list) -> list:
+    return items[:MAX_LIST_ITEMS]
+
+def parse_requirements(text: str) -> Dict[str, Any]:
+    lines = [line.split(' #')[0].strip() for line in text.splitlines()]
+    return {'requirements': _cap([line for line in lines if line and not line.startswith('#')])}
+
+def parse_pyproject(text: str) -> Dict[str, Any]:
+    if tomllib is None:
+        return {'requires': _cap(re.findall(r'^\s*"([^"]+)",?\s*$', text, re.MULTILINE))}
+    data = tomllib.loads(text)
+    project = data.get('project', {})
+    poetry = data.get('tool', {}).get('poetry', {})
+    result = {
+        'name': project.get('name') or poetry.get('name'),
+        'requires_python': project.get('requires-python'),
+        'dependencies': _cap(project.get('dependencies', [])),
+        'optional_dependencies': sorted(project.get('optional-dependencies', {})),
+        'build_requires': data.get('build-system', {}).get('requires', []),
+        'build_backend': data.get('build-system', {}).get('build-backend'),
+        'poetry_dependencies': poetry.get('dependencies'),
+        'scripts': sorted(project.get('scripts', {})),
+    }
+    return {k: v for k, v in result.items() if v}
+
+def parse_setup_cfg(text: str) -> Dict[str, Any]:
+    config = configparser.ConfigParser(interpolation=None)
+    config.read_string(text)
+    result = {}
+    if config.has_option('options', 'python_requires'):
+        result['requires_python'] = config.get('options', 'python_requires').strip()
+    if config.has_option('options', 'install_requires'):
+        result['dependencies'] = _cap([r.strip() for r in config.get('options', 'install_requires').splitlines() if r.strip()])
+    if config.has_section('options.extras_require'):
+        result['optional_dependencies'] = config.options('options.extras_require')
+    return result
+
+def parse_setup_py(text: str) -> Dict[str, Any]:
+    result = {}
+    for node in ast.walk(ast.parse(text)):
+        if isinstance(node, ast.Call) and getattr(node.func, 'id', getattr(node.func, 'attr', None)) == 'setup':
+            for keyword in node.keywords:
+                if keyword.arg in ('name', 'python_requires', 'install_requires', 'extras_require', 'setup_requires'):
+                    try:
+                        result[keyword.arg] = ast.literal_eval(keyword.value)
+                    except ValueError:
+                        result[keyword.arg] = '<dynamic>'
+    if isinstance(result.get('extras_require'), dict):
+        result['extras_require'] = sorted(result['extras_require'])
+    return result
+
+def parse_package_json(text: str) -> Dict[str, Any]:
+    data = json.loads(text)
+    result = {
+        'name': data.get('name'),
+        'engines': data.get('engines'),
+        'package_manager': data.get('packageManager'),
+        'scripts': data.get('scripts'),
+        'dependencies': data.get('dependencies'),
+        'dev_dependencies': sorted(data.get('devDependencies', {})),
+        'workspaces': data.get('workspaces'),
+    }
+    return {k: v for k, v in result.items() if v}
+
+def parse_dockerfile(text: str) -> Dict[str, Any]:
+    instructions = [re.sub(r'\s+', ' ', line).strip() for line in text.replace('\\\n', ' ').splitlines()]
+    keep = ('FROM', 'RUN', 'ENV', 'ARG', 'EXPOSE', 'CMD', 'ENTRYPOINT', 'WORKDIR')
+    return {'instructions': _cap([line for line in instructions if line.split(' ', 1)[0].upper() in keep])}
+
+def parse_makefile(text: str) -> Dict[str, Any]:
+    targets = re.findall(r'^([A-Za-z0-9_.\-/]+)\s*:(?!=)', text, re.MULTILINE)
+    return {'targets': _cap([t for t in dict.fromkeys(targets) if not t.startswith('.')])}
+
+PARSERS = {
+    'requirements': parse_requirements,
+    'pyproject.toml': parse_pyproject,
+    'setup.cfg': parse_setup_cfg,
+    'setup.py': parse_setup_py,
+    'package.json': parse_package_json,
+    'Dockerfile': parse_dockerfile,
+    'Makefile': parse_makefile,
+}
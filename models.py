@@ -1,8 +1,9 @@
 from pydantic import BaseModel, Field, validator
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from instructor import OpenAISchema
 from datetime import date
+import hashlib
 
 class Node(BaseModel):
     id: int
@@ -58,6 +59,35 @@ class Diff(OpenAISchema):
         ),
     )
 
+class Manifest(BaseModel):
+    path: str = Field(..., description="Path of the manifest relative to the repository root")
+    kind: str = Field(..., description="Manifest type, e.g. 'requirements', 'package.json', 'lockfile'")
+    sha256: str = Field(..., description="SHA-256 of the file, or of its first bytes when it exceeds the size cap")
+    size: int
+    parsed: bool = Field(default=True, description="False when the file was too large or not text")
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+class ManifestSummary(BaseModel):
+    manifests: List[Manifest] = Field(default_factory=list)
+
+    def digest(self) -> str:
+        h = hashlib.sha256()
+        for manifest in sorted(self.manifests, key=lambda m: m.path):
+            h.update(f"{manifest.path}\0{manifest.size}\0{manifest.sha256}\n".encode())
+        return h.hexdigest()
+
+class Hotspot(BaseModel):
+    file: str = Field(..., description="Path relative to the repository root")
+    function: str
+    start_line: int
+    end_line: int
+    calls: int = 0
+    cumtime: float = Field(default=0.0, description="Cumulative seconds spent in the function and its callees")
+    tottime: float = Field(default=0.0, description="Seconds spent in the function itself")
+    samples: int = Field(default=0, description="Sampling profiler hits with the function on the stack")
+    hot_lines: List[int] = Field(default_factory=list, description="Most sampled lines, hottest first")
+    chunk_ids: List[int] = Field(default_factory=list, description="Knowledge base chunks covering the function")
+
 class Suggestion(BaseModel):
     title: str
     description: str
@@ -67,7 +97,41 @@ class Suggestion(BaseModel):
 class ImplementationInstructions(BaseModel):
     suggestion: Suggestion
     steps: List[str]
-    code_changes: Optional[str]
+    code_changes: Optional[str] = Field(
+        ...,
+        description=(
+            "All code changes as one unified diff against the repository (as produced by 'git diff', "
+            "with 'a/' and 'b/' path prefixes and correct hunk headers) that applies cleanly with 'git apply'"
+        ),
+    )
+
+class Measurement(BaseModel):
+    passed: bool = Field(..., description="Whether the test command exited successfully")
+    seconds: Optional[float] = Field(default=None, description="Best observed time of the measured command")
+    source: str = Field(default="wall", description="'pytest-benchmark' or 'wall' clock timing of the test run")
+    output: str = Field(default="", description="Tail of the command output")
+
+class VerificationResult(BaseModel):
+    title: str
+    branch: str
+    applied: bool = False
+    baseline: Optional[Measurement] = None
+    after: Optional[Measurement] = None
+    speedup: Optional[float] = Field(default=None, description="Baseline time divided by time after the change")
+    kept: bool = False
+    error: Optional[str] = None
+
+    def summary(self) -> str:
+        if self.error is not None:
+            return f"Failed to implement suggestion: {self.title}. Error: {self.error}"
+        if not self.baseline.passed:
+            return f"Rejected suggestion: {self.title}. Tests fail on the unmodified repository"
+        if not self.after.passed:
+            return f"Rejected suggestion: {self.title}. Tests failed after the change"
+        if self.speedup is None:
+            return f"Rejected suggestion: {self.title}. Could not measure a speedup"
+        verdict = f"Changes kept in branch {self.branch} for suggestion" if self.kept else "Rejected suggestion"
+        return f"{verdict}: {self.title}. Measured speedup {self.speedup:.2f}x ({self.baseline.seconds:.3f}s -> {self.after.seconds:.3f}s, {self.after.source})"
 
 class Extraction(BaseModel):
     topic: str
@@ -100,6 +164,8 @@ class AnalyzeRequest(BaseModel):
     repo_url: str = Field(..., description="URL of the GitHub repository")
     model: str = Field(default="claude-3-5-sonnet-20240620", description="Model to use for analysis")
     query: str = Field(..., description="User's original query for code analysis")
+    beam_width: int = Field(default=1, ge=1, le=5, description="Number of follow-up questions explored concurrently per round")
+    depth: int = Field(default=3, ge=1, le=10, description="Maximum number of question rounds, including the original query")
 
     @validator('repo_url', 'query')
     def check_not_empty(cls, v):
@@ -107,9 +173,57 @@ class AnalyzeRequest(BaseModel):
             raise ValueError("This field cannot be empty")
         return v
 
+class BatchAnalyzeRequest(BaseModel):
+    repo_urls: List[str] = Field(..., description="URLs of the GitHub repositories")
+    model: str = Field(default="claude-3-5-sonnet-20240620", description="Model to use for analysis")
+    query: str = Field(..., description="User's original query, asked of every repository")
+    beam_width: int = Field(default=1, ge=1, le=5, description="Number of follow-up questions explored concurrently per round")
+    depth: int = Field(default=3, ge=1, le=10, description="Maximum number of question rounds, including the original query")
+    max_concurrent_repos: int = Field(default=4, ge=1, description="Number of repositories cloned and analyzed at once")
+    max_concurrent_llm_calls: int = Field(default=16, ge=1, description="Model calls in flight across all repositories")
+
+    @validator('repo_urls')
+    def check_repo_urls(cls, v):
+        v = [url.strip() for url in v if url.strip()]
+        if not v:
+            raise ValueError("At least one repository URL is required")
+        return list(dict.fromkeys(v))
+
+    @validator('query')
+    def check_not_empty(cls, v):
+        if not v.strip():
+            raise ValueError("This field cannot be empty")
+        return v
+
+class RepoReport(BaseModel):
+    repo_url: str
+    comprehensive_report: Optional[str] = None
+    chunks: int = Field(default=0, description="Chunks extracted for this repository")
+    deduplicated_chunks: int = Field(default=0, description="Chunks whose extraction was reused from identical content")
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+class FleetReport(BaseModel):
+    repos: List[RepoReport] = Field(default_factory=list)
+    succeeded: int = 0
+    failed: int = 0
+    total_chunks: int = 0
+    unique_chunks: int = Field(default=0, description="Distinct chunk contents across all repositories")
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        reused = sum(r.deduplicated_chunks for r in self.repos)
+        saved = reused / self.total_chunks if self.total_chunks else 0.0
+        return (
+            f"{self.succeeded}/{len(self.repos)} repositories analyzed in {self.seconds:.1f}s, {self.failed} failed. "
+            f"{self.total_chunks} chunks, {self.unique_chunks} unique; deduplication saved {saved:.0%} of extraction calls."
+        )
+
 class ImproveRequest(BaseModel):
     repo_url: str = Field(..., description="URL of the GitHub repository")
     model: str = Field(default="claude-3-5-sonnet-20240620", description="Model to use for improvement suggestions")
+    profile_command: Optional[List[str]] = Field(default=None, description="Entry point to profile, as arguments to python (e.g. ['-m', 'pytest'] or ['main.py']); defaults to the test suite")
+    profile_timeout: int = Field(default=300, ge=1, description="Time budget in seconds for profiling")
 
     @validator('repo_url')
     def check_not_empty(cls, v):
@@ -1,27 +1,36 @@
 import ast
 import os
 import asyncio
+import logging
 import radon.complexity as radon_cc
 import pylint.lint
 from pylint.reporters.text import TextReporter
 from io import StringIO
-from typing import List, Dict
-import git
-from models import Suggestion, ImplementationInstructions, KnowledgeGraph, EnhancedCodeQuery
+from typing import List, Dict, Optional, Sequence
+from models import Suggestion, ImplementationInstructions, KnowledgeGraph, EnhancedCodeQuery, Hotspot
 from app import aclient
 from analysis_utils import analyze_files, rag_analyze_repo
+from repo_utils import create_knowledge_base
+from verification_utils import verify_suggestions
+from profiling_utils import profile_repo, format_hotspots, PROFILE_TIMEOUT
+from chunk_store import ChunkStore
 
-async def generate_performance_suggestions(knowledge_graph: KnowledgeGraph, report: str, model: str) -> List[Suggestion]:
+logger = logging.getLogger(__name__)
+
+async def generate_performance_suggestions(knowledge_graph: KnowledgeGraph, report: str, model: str, hotspots: Optional[List[Hotspot]] = None, knowledge_base: Optional[ChunkStore] = None) -> List[Suggestion]:
+    profile = ""
+    if hotspots:
+        profile = f"\n\nMeasured Hotspots (from profiling the test suite, hottest first):\n{format_hotspots(hotspots, knowledge_base)}"
     completion = await aclient.chat.completions.create(
         model=model,
         messages=[
             {
                 "role": "system",
-                "content": "You are an expert code analyst. Based on the provided knowledge graph and analysis report, generate the top 4 suggestions to improve the performance of the code. Assign a score between 0 and 1 to each suggestion, with 1 being the highest priority.",
+                "content": "You are an expert code analyst. Based on the provided knowledge graph and analysis report, generate the top 4 suggestions to improve the performance of the code. When measured hotspots are provided, target the functions that actually consume time. Assign a score between 0 and 1 to each suggestion, with 1 being the highest priority.",
             },
             {
                 "role": "user",
-                "content": f"Knowledge Graph:\n{knowledge_graph.model_dump_json(indent=2)}\n\nAnalysis Report:\n{report}\n\nGenerate the top 4 performance improvement suggestions with scores.",
+                "content": f"Knowledge Graph:\n{knowledge_graph.model_dump_json(indent=2)}\n\nAnalysis Report:\n{report}{profile}\n\nGenerate the top 4 performance improvement suggestions with scores.",
             },
         ],
         response_model=List[Suggestion],
@@ -35,11 +44,11 @@ async def generate_implementation_instructions(suggestion: Suggestion, knowledge
         messages=[
             {
                 "role": "system",
-                "content": "You are an expert software engineer. Provide detailed instructions on how to implement the given performance improvement suggestion.",
+                "content": "You are an expert software engineer. Provide detailed instructions on how to implement the given performance improvement suggestion. Give the code changes as a single unified diff against the existing files of the repository, exactly as 'git diff' prints it, so that it applies with 'git apply'. Changes that are not a diff are discarded.",
             },
             {
                 "role": "user",
-                "content": f"Suggestion:\n{suggestion.model_dump_json(indent=2)}\n\nKnowledge Graph:\n{knowledge_graph.model_dump_json(indent=2)}\n\nProvide step-by-step instructions and any necessary code changes to implement this suggestion.",
+                "content": f"Suggestion:\n{suggestion.model_dump_json(indent=2)}\n\nKnowledge Graph:\n{knowledge_graph.model_dump_json(indent=2)}\n\nProvide step-by-step instructions and the unified diff that implements this suggestion.",
             },
         ],
         response_model=ImplementationInstructions,
@@ -122,48 +131,38 @@ async def analyze_performance_bottlenecks(repo_path: str) -> Dict[str, Dict[str,
     
     return bottlenecks
 
-async def improve_repo_performance(repo_path: str, model: str) -> str:
-    knowledge_graph = await analyze_files(repo_path, model)
-    enhanced_query = EnhancedCodeQuery(
-        rewritten_query="Provide a comprehensive analysis of the code structure and potential performance bottlenecks.",
-        relevant_timeframe=None,
-        analysis_focus=["performance", "complexity", "style"]
-    )
-    report = await rag_analyze_repo(repo_path, enhanced_query, model)
+async def improve_repo_performance(repo_path: str, model: str, profile_command: Optional[Sequence[str]] = None, profile_timeout: int = PROFILE_TIMEOUT) -> str:
+    # Build the chunk store once and share it read-only between stages
+    knowledge_base = await create_knowledge_base(repo_path)
+    with knowledge_base:
+        # Profiling runs in a subprocess, so it overlaps with the LLM analysis below
+        profiling = asyncio.create_task(profile_repo(repo_path, profile_command, profile_timeout, knowledge_base))
+        knowledge_graph = await analyze_files(repo_path, model, knowledge_base=knowledge_base)
+        enhanced_query = EnhancedCodeQuery(
+            rewritten_query="Provide a comprehensive analysis of the code structure and potential performance bottlenecks.",
+            relevant_timeframe=None,
+            analysis_focus=["performance", "complexity", "style"]
+        )
+        report = await rag_analyze_repo(repo_path, enhanced_query, model, knowledge_base=knowledge_base)
+    
+        bottlenecks = await analyze_performance_bottlenecks(repo_path)
+        report += f"\n\nPerformance Bottlenecks:\n{bottlenecks}"
     
-    bottlenecks = await analyze_performance_bottlenecks(repo_path)
-    report += f"\n\nPerformance Bottlenecks:\n{bottlenecks}"
+        try:
+            hotspots = await profiling
+        except Exception as e:
+            logger.error(f"Error profiling repository: {str(e)}")
+            hotspots = []
     
-    suggestions = await generate_performance_suggestions(knowledge_graph, report, model)
+        suggestions = await generate_performance_suggestions(knowledge_graph, report, model, hotspots, knowledge_base)
     
     # Sort suggestions by score in descending order
     suggestions.sort(key=lambda x: x.score, reverse=True)
     
-    implemented_suggestions = []
-    for suggestion in suggestions[:2]:  # Implement top 2 suggestions
-        instructions = await generate_implementation_instructions(suggestion, knowledge_graph, model)
-        result = await implement_suggestion(repo_path, instructions)
-        implemented_suggestions.append(result)
+    # Implement top 2 suggestions, each verified in its own worktree
+    instructions = await asyncio.gather(*[
+        generate_implementation_instructions(suggestion, knowledge_graph, model) for suggestion in suggestions[:2]
+    ])
+    results = await verify_suggestions(repo_path, instructions)
     
-    return "\n".join(implemented_suggestions)
-
-async def implement_suggestion(repo_path: str, instructions: ImplementationInstructions) -> str:
-    repo = git.Repo(repo_path)
-    branch_name = f"implement-{instructions.suggestion.title.lower().replace(' ', '-')}"
-    repo.git.checkout('-b', branch_name)
-
-    try:
-        if instructions.code_changes:
-            file_path = os.path.join(repo_path, instructions.suggestion.title.lower().replace(' ', '_') + '_changes.py')
-            with open(file_path, 'w') as f:
-                f.write(instructions.code_changes)
-            repo.git.add(file_path)
-        
-        commit_message = f"Implement performance improvement: {instructions.suggestion.title}"
-        repo.git.commit('-m', commit_message)
-        
-        return f"Changes implemented for suggestion: {instructions.suggestion.title} in branch {branch_name}"
-    except Exception as e:
-        repo.git.checkout('master')
-        repo.git.branch('-D', branch_name)
-        return f"Failed to implement suggestion: {instructions.suggestion.title}. Error: {str(e)}"
+    return "\n".join(result.summary() for result in results)
@@ -0,0 +1,92 @@
+"""Profile a command under cProfile and a signal-based stack sampler.
+
+Usage: python profile_driver.py OUTPUT.json (-m module | script.py) [args...]
+
+Run as a subprocess by profiling_utils. Results are written as JSON on normal
+exit, SystemExit or SIGTERM, so a run stopped by the time budget still reports.
+"""
+import os
+import sys
+import json
+import signal
+import runpy
+import pstats
+import cProfile
+from collections import Counter
+
+SAMPLE_INTERVAL = 0.005
+
+profiler = cProfile.Profile()
+function_samples = Counter()
+line_samples = Counter()
+written = False
+
+
+def sample(signum, frame):
+    # Count every function and line on the stack once per sample
+    functions = set()
+    lines = set()
+    while frame is not None:
+        code = frame.f_code
+        functions.add((code.co_filename, code.co_firstlineno))
+        lines.add((code.co_filename, frame.f_lineno))
+        frame = frame.f_back
+    function_samples.update(functions)
+    line_samples.update(lines)
+
+
+def write_results(output: str) -> None:
+    global written
+    if written:
+        return
+    written = True
+    signal.setitimer(signal.ITIMER_PROF, 0)
+    profiler.disable()
+    stats = pstats.Stats(profiler).stats
+    results = {
+        'sample_interval': SAMPLE_INTERVAL,
+        'functions': [
+            {'file': file, 'line': line, 'function': name, 'calls': calls, 'tottime': tottime, 'cumtime': cumtime}
+            for (file, line, name), (_, calls, tottime, cumtime, _) in stats.items()
+        ],
+        'function_samples': [[file, line, count] for (file, line), count in function_samples.items()],
+        'line_samples': [[file, line, count] for (file, line), count in line_samples.items()],
+    }
+    with open(output, 'w') as f:
+        json.dump(results, f)
+
+
+def main() -> None:
+    output, target = sys.argv[1], sys.argv[2:]
+
+    def terminate(signum, frame):
+        write_results(output)
+        os._exit(128 + signum)
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGPROF, sample)
+
+    # Make the target see the same sys.argv and sys.path[0] as when run directly
+    if target[0] == '-m':
+        sys.argv = target[1:]
+        sys.path[0] = os.getcwd()
+        run = lambda: runpy.run_module(target[1], run_name='__main__', alter_sys=True)
+    else:
+        sys.argv = target
+        sys.path[0] = os.path.dirname(os.path.abspath(target[0]))
+        run = lambda: runpy.run_path(target[0], run_name='__main__')
+
+    exit_code = 0
+    signal.setitimer(signal.ITIMER_PROF, SAMPLE_INTERVAL, SAMPLE_INTERVAL)
+    profiler.enable()
+    try:
+        run()
+    except SystemExit as e:
+        exit_code = e.code
+    finally:
+        write_results(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import os
+import ast
+import sys
+import json
+import logging
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from models import Hotspot
+from chunk_store import ChunkStore
+from verification_utils import run_sandboxed
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TIMEOUT = 300
+MAX_HOTSPOTS = 10
+MAX_HOT_LINES = 3
+MIN_HOTSPOT_SHARE = 0.01
+MAX_HOTSPOT_CHUNKS = 8
+DEFAULT_PROFILE_COMMAND = ['-m', 'pytest', '-q', '-p', 'no:cacheprovider']
+DRIVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profile_driver.py')
+
+async def profile_repo(repo_path: str, command: Optional[Sequence[str]] = None, timeout: int = PROFILE_TIMEOUT, knowledge_base: Optional[ChunkStore] = None, max_hotspots: int = MAX_HOTSPOTS) -> List[Hotspot]:
+    """Run the repo's tests (or command, as arguments to python) under the profilers and return its hotspots.
+
+    Profiling runs in a sandboxed subprocess; when the time budget runs out
+    the partial profile collected so far is used.
+    """
+    fd, output = tempfile.mkstemp(suffix='.json', prefix='forker-profile-')
+    os.close(fd)
+    try:
+        argv = [sys.executable, DRIVER_PATH, output] + list(command or DEFAULT_PROFILE_COMMAND)
+        returncode, log, seconds = await run_sandboxed(argv, repo_path, timeout)
+        if returncode is None:
+            logger.warning(f"Profiling stopped after the {timeout}s budget, using partial results")
+        elif returncode != 0:
+            logger.info(f"Profiled command exited with code {returncode}")
+        if not os.path.getsize(output):
+            logger.warning(f"Profiler produced no results:\n{log}")
+            return []
+        with open(output) as f:
+            try:
+                profile = json.load(f)
+            except ValueError as e:
+                logger.warning(f"Profiler results are incomplete, ignoring them: {str(e)}")
+                return []
+    finally:
+        os.remove(output)
+    hotspots = aggregate_hotspots(repo_path, profile, knowledge_base, max_hotspots)
+    logger.info(f"Profiled repository in {seconds:.1f}s, found {len(hotspots)} hotspots")
+    return hotspots
+
+def is_test_file(path: str) -> bool:
+    name = os.path.basename(path)
+    parts = path.split(os.sep)
+    return name.startswith('test_') or name.endswith('_test.py') or name == 'conftest.py' or 'tests' in parts or 'test' in parts
+
+def aggregate_hotspots(repo_path: str, profile: dict, knowledge_base: Optional[ChunkStore] = None, max_hotspots: int = MAX_HOTSPOTS) -> List[Hotspot]:
+    """Rank the repo's own non-test functions by cumulative time and map them to source.
+
+    Functions from the standard library, installed packages and test files
+    are skipped so suggestions target the code under test.
+    """
+    root = os.path.realpath(repo_path)
+    resolved: Dict[str, Optional[str]] = {}
+
+    def relative(file: str) -> Optional[str]:
+        if file not in resolved:
+            path = os.path.realpath(os.path.join(root, file))
+            rel = os.path.relpath(path, root)
+            inside = path.startswith(root + os.sep) and os.path.isfile(path)
+            resolved[file] = rel if inside and not is_test_file(rel) else None
+        return resolved[file]
+
+    function_samples = {(relative(f), line): count for f, line, count in profile.get('function_samples', [])}
+    line_samples: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    for file, line, count in profile.get('line_samples', []):
+        rel = relative(file)
+        if rel:
+            line_samples[rel].append((line, count))
+
+    hotspots = []
+    for fn in profile.get('functions', []):
+        rel = relative(fn['file'])
+        if rel is None:
+            continue
+        hotspots.append(Hotspot(
+            file=rel,
+            function=fn['function'],
+            start_line=fn['line'],
+            end_line=fn['line'],
+            calls=fn['calls'],
+            cumtime=fn['cumtime'],
+            tottime=fn['tottime'],
+            samples=function_samples.get((rel, fn['line']), 0),
+        ))
+    hotspots.sort(key=lambda h: (h.cumtime, h.samples), reverse=True)
+    # Functions that took under MIN_HOTSPOT_SHARE of the hottest one are noise
+    hotspots = [h for h in hotspots[:max_hotspots] if h.cumtime >= hotspots[0].cumtime * MIN_HOTSPOT_SHARE]
+
+    for hotspot in hotspots:
+        hotspot.end_line = function_end_line(os.path.join(root, hotspot.file), hotspot.start_line)
+        lines = [(line, count) for line, count in line_samples[hotspot.file] if hotspot.start_line <= line <= hotspot.end_line]
+        hotspot.hot_lines = [line for line, _ in sorted(lines, key=lambda lc: lc[1], reverse=True)[:MAX_HOT_LINES]]
+    if knowledge_base is not None:
+        map_to_chunks(root, hotspots, knowledge_base)
+    return hotspots
+
+def function_end_line(file_path: str, start_line: int) -> int:
+    """Last line of the function whose code starts at start_line (its first decorator, if any)."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError, UnicodeDecodeError):
+        return start_line
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            first = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+            if first == start_line:
+                return node.end_lineno
+    if start_line == 1 and tree.body:  # Module-level code
+        return tree.body[-1].end_lineno
+    return start_line
+
+def map_to_chunks(root: str, hotspots: List[Hotspot], knowledge_base: ChunkStore) -> None:
+    """Fill in the ids of the knowledge base chunks that overlap each hotspot's line range."""
+    chunks_by_file = defaultdict(list)
+    wanted = {os.path.join(root, h.file) for h in hotspots}
+    for i in range(len(knowledge_base)):
+        path, offset, length = knowledge_base.location(i)
+        path = os.path.realpath(path)
+        if path in wanted:
+            chunks_by_file[path].append((i, offset, length))
+    line_starts = {}
+    for hotspot in hotspots:
+        path = os.path.join(root, hotspot.file)
+        if path not in line_starts:
+            with open(path, 'rb') as f:
+                starts = [0]
+                for line in f:
+                    starts.append(starts[-1] + len(line))
+            line_starts[path] = starts
+        starts = line_starts[path]
+        start = starts[min(hotspot.start_line, len(starts)) - 1]
+        end = starts[min(hotspot.end_line, len(starts) - 1)]
+        hotspot.chunk_ids = [i for i, offset, length in chunks_by_file[path] if offset < end and offset + length > start]
+
+def format_hotspots(hotspots: List[Hotspot], knowledge_base: Optional[ChunkStore] = None, max_chunks: int = MAX_HOTSPOT_CHUNKS) -> str:
+    """Render hotspots for a prompt, followed by the source of the hottest ones."""
+    lines = [
+        f"{h.file}:{h.start_line}-{h.end_line} {h.function}: {h.cumtime:.3f}s cumulative, {h.tottime:.3f}s own, "
+        f"{h.calls} calls, {h.samples} samples" + (f", hot lines {h.hot_lines}" if h.hot_lines else "")
+        for h in hotspots
+    ]
+    if knowledge_base is not None:
+        chunk_ids = list(dict.fromkeys(i for h in hotspots for i in h.chunk_ids))[:max_chunks]
+        lines += [f"\nSource chunk {i} ({knowledge_base.location(i)[0]}):\n{knowledge_base[i]}" for i in chunk_ids]
+    return "\n".join(lines)
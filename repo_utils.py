@@ -1,7 +1,9 @@
 import os
 import git
 from models import Program, File
-from typing import List
+from chunk_store import ChunkStore
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
 import logging
 import shutil
 
@@ -11,27 +13,69 @@ async def clone_repo(repo_url: str, local_path: str) -> str:
     logger.info(f"Cloning repository from {repo_url} to {local_path}")
     if os.path.exists(local_path):
         logger.info(f"Directory {local_path} already exists. Removing it.")
-        shutil.rmtree(local_path)
-    git.Repo.clone_from(repo_url, local_path)
+        await asyncio.to_thread(shutil.rmtree, local_path)
+    await asyncio.to_thread(git.Repo.clone_from, repo_url, local_path)
     logger.info("Repository cloned successfully")
     return local_path
 
-async def create_knowledge_base(repo_path: str) -> List[str]:
+async def create_knowledge_base(repo_path: str) -> ChunkStore:
     logger.info("Creating knowledge base from repository contents")
-    knowledge_base = []
-    for root, _, files in os.walk(repo_path):
+    knowledge_base = ChunkStore()
+    async for _ in stream_knowledge_base(repo_path, knowledge_base):
+        pass
+    logger.info(f"Knowledge base created with {len(knowledge_base)} entries")
+    return knowledge_base
+
+async def stream_knowledge_base(repo_path: str, knowledge_base: Optional[ChunkStore] = None) -> AsyncIterator[str]:
+    """Yield chunks file by file as they are indexed.
+
+    Directories are listed and files read in a worker thread, one directory
+    or file at a time, so the event loop is never blocked by the scan.
+    Files are visited in the same order as os.walk.
+    """
+    if knowledge_base is None:
+        knowledge_base = ChunkStore()
+    pending = [repo_path]
+    while pending:
+        root = pending.pop()
+        try:
+            dirs, files = await asyncio.to_thread(list_dir, root)
+        except OSError as e:
+            logger.warning(f"Error listing directory {root}: {str(e)}")
+            continue
+        pending.extend(os.path.join(root, d) for d in reversed(dirs))
         for file in files:
             if is_allowed_file(file):
                 file_path = os.path.join(root, file)
+                start = len(knowledge_base)
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        chunks = [content[i:i+1000] for i in range(0, len(content), 1000)]
-                        knowledge_base.extend(chunks)
+                    await asyncio.to_thread(knowledge_base.add_file, file_path)
                 except Exception as e:
                     logger.warning(f"Error reading file {file_path}: {str(e)}")
-    logger.info(f"Knowledge base created with {len(knowledge_base)} entries")
-    return knowledge_base
+                    continue
+                for i in range(start, len(knowledge_base)):
+                    yield knowledge_base[i]
+
+def list_dir(path: str) -> Tuple[List[str], List[str]]:
+    """Return (subdirectories, files) of path like one step of os.walk.
+
+    As with os.walk, symlinked directories are neither listed as files nor
+    descended into.
+    """
+    dirs, files = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+    return dirs, files
+
+async def iter_knowledge_base(knowledge_base: ChunkStore) -> AsyncIterator[str]:
+    """Yield the chunks of an already built knowledge base."""
+    for chunk in knowledge_base:
+        yield chunk
 
 def is_allowed_file(filename: str) -> bool:
     """Check if the file has an allowed extension."""
@@ -0,0 +1,125 @@
+import asyncio
+import analysis_utils
+from chunk_store import ChunkStore
+from models import EnhancedCodeQuery, Extraction
+from analysis_utils import stream_extractions, dedup_questions, question_tokens, rag_analyze_repo
+
+
+async def chunk_stream(n):
+    for i in range(n):
+        yield f"chunk {i}"
+
+
+def fake_extraction(chunk):
+    return Extraction(topic=chunk, summary=chunk, keywords=[chunk])
+
+
+def test_stream_extractions_yields_every_result():
+    async def extract(chunk, model):
+        await asyncio.sleep(0)
+        return fake_extraction(chunk)
+
+    async def run():
+        return [e.topic async for e in stream_extractions(chunk_stream(50), "m", workers=4, queue_size=2, extract_fn=extract)]
+
+    assert sorted(asyncio.run(run())) == sorted(f"chunk {i}" for i in range(50))
+
+
+def test_stream_extractions_survives_failing_extract_fn():
+    async def extract(chunk, model):
+        if chunk == "chunk 7":
+            raise RuntimeError("boom")
+        return None if chunk == "chunk 3" else fake_extraction(chunk)
+
+    async def run():
+        stream = stream_extractions(chunk_stream(20), "m", workers=4, extract_fn=extract)
+        return [e.topic async for e in stream]
+
+    topics = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert len(topics) == 18
+    assert "chunk 7" not in topics and "chunk 3" not in topics
+
+
+def test_closing_stream_early_stops_workers():
+    started = []
+
+    async def extract(chunk, model):
+        started.append(chunk)
+        await asyncio.sleep(0.01)
+        return fake_extraction(chunk)
+
+    async def run():
+        stream = stream_extractions(chunk_stream(1000), "m", workers=2, queue_size=2, extract_fn=extract)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        return first, pending
+
+    first, pending = asyncio.run(run())
+    assert first.topic.startswith("chunk")
+    assert pending == []
+    assert len(started) < 20
+
+
+def test_dedup_questions_drops_one_word_paraphrases():
+    asked = []
+    questions = dedup_questions([
+        "How is caching done in the API?",
+        "How is caching handled in the API?",
+        "How is caching implemented in the APIs?",
+        "How is logging done in the API?",
+    ], asked, limit=5)
+    assert questions == ["How is caching done in the API?", "How is logging done in the API?"]
+
+
+def test_dedup_questions_skips_already_asked_and_respects_limit():
+    asked = [question_tokens("What does the parser module do?")]
+    questions = dedup_questions([
+        "Here are three follow-up questions:",
+        "1. What does the parser module do?",
+        "2. How are database connections pooled?",
+        "3) Which functions allocate the most memory?",
+        "- Where are retries configured?",
+    ], asked, limit=2)
+    assert questions == ["How are database connections pooled?", "Which functions allocate the most memory?"]
+    assert len(asked) == 3
+
+
+def test_dedup_questions_keeps_plain_lines_without_question_marks():
+    assert dedup_questions(["", "Explain the cache layer", "  "], [], limit=3) == ["Explain the cache layer"]
+
+
+def test_rag_analyze_repo_bounds_model_calls_with_llm_slots(tmp_path, monkeypatch):
+    path = tmp_path / "cache.py"
+    path.write_text("x" * 3000)
+    store = ChunkStore()
+    store.add_file(str(path))
+    running, peak = [0], [0]
+
+    def tracked(result):
+        async def call(*args):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+            return result
+        return call
+
+    async def extract(chunk, model):
+        return Extraction(topic="cache", summary="cache", keywords=["cache"])
+
+    monkeypatch.setattr(analysis_utils, "answer_question", tracked("The cache is an LRU."))
+    monkeypatch.setattr(analysis_utils, "generate_follow_up_questions", tracked([
+        "How does the cache evict entries?",
+        "Which module owns cache invalidation?",
+        "Where is cache warmup configured?",
+    ]))
+    query = EnhancedCodeQuery(rewritten_query="How does the cache work?", analysis_focus=["performance"])
+
+    report = asyncio.run(rag_analyze_repo(
+        str(tmp_path), query, "m", knowledge_base=store, beam_width=3, min_novelty=0,
+        extract_fn=extract, llm_slots=asyncio.Semaphore(1),
+    ))["comprehensive_report"]
+    assert report.count("The cache is an LRU.") == 4
+    assert peak[0] == 1
@@ -0,0 +1,63 @@
+import asyncio
+from collections import Counter
+import batch_utils
+from batch_utils import ExtractionCache
+from models import Extraction, FleetReport, RepoReport
+
+
+def fake_extract(calls, fail=()):
+    async def extract_info(chunk, model):
+        calls.append(chunk)
+        await asyncio.sleep(0.01)
+        return None if chunk in fail else Extraction(topic=chunk, summary=chunk)
+    return extract_info
+
+
+def test_concurrent_identical_chunks_are_extracted_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(batch_utils, "extract_info", fake_extract(calls))
+
+    async def run():
+        cache = ExtractionCache()
+        counters = [Counter() for _ in range(3)]
+        results = await asyncio.gather(*[
+            cache.extract(chunk, "m", counter)
+            for counter in counters
+            for chunk in ("same", "same", "other")
+        ])
+        return cache, counters, results
+
+    cache, counters, results = asyncio.run(run())
+    assert sorted(calls) == ["other", "same"]
+    assert all(r is not None for r in results)
+    assert cache.unique_chunks == 2
+    assert sum(c['chunks'] for c in counters) == 9
+    assert sum(c['deduplicated'] for c in counters) == 7
+
+
+def test_failures_are_retried_and_not_counted_as_deduplicated(monkeypatch):
+    calls = []
+    monkeypatch.setattr(batch_utils, "extract_info", fake_extract(calls, fail={"bad"}))
+
+    async def run():
+        cache = ExtractionCache()
+        counter = Counter()
+        concurrent = await asyncio.gather(*[cache.extract("bad", "m", counter) for _ in range(3)])
+        retried = await cache.extract("bad", "m", counter)
+        await cache.extract("good", "m", counter)
+        return cache, counter, concurrent + [retried]
+
+    cache, counter, results = asyncio.run(run())
+    assert results == [None] * 4
+    assert calls == ["bad", "bad", "good"]
+    assert cache.calls == 3
+    assert cache.unique_chunks == 2
+    assert counter == Counter(chunks=5)
+
+
+def test_fleet_summary_reports_reused_extractions():
+    fleet = FleetReport(
+        repos=[RepoReport(repo_url="a", chunks=10), RepoReport(repo_url="b", chunks=10, deduplicated_chunks=5)],
+        succeeded=2, total_chunks=20, unique_chunks=15,
+    )
+    assert "20 chunks, 15 unique; deduplication saved 25% of extraction calls" in fleet.summary()
@@ -0,0 +1,71 @@
+import pytest
+from chunk_store import ChunkStore, CHUNK_SIZE
+
+
+def legacy_chunks(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return [content[i:i+CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE)]
+
+
+@pytest.mark.parametrize("content", [
+    "a",
+    "x = 1\n" * 600,
+    "é" * 2500,
+    "日本語" * 777,
+    "ab\r\ncd\r\n" * 400,
+    "a" * 999 + "\r\n" + "b" * 5,
+    "x\r" * 700 + "\r\n" * 600,
+])
+def test_chunks_match_text_mode_slices(tmp_path, content):
+    path = tmp_path / "file.py"
+    path.write_bytes(content.encode('utf-8'))
+    store = ChunkStore()
+    store.add_file(str(path))
+    assert list(store) == legacy_chunks(path)
+
+
+def test_empty_file_has_no_chunks(tmp_path):
+    path = tmp_path / "empty.py"
+    path.write_bytes(b"")
+    store = ChunkStore()
+    assert store.add_file(str(path)) == 0
+    assert len(store) == 0
+
+
+def test_invalid_utf8_leaves_store_unchanged(tmp_path):
+    good = tmp_path / "good.py"
+    good.write_text("print('hi')\n")
+    bad = tmp_path / "bad.py"
+    bad.write_bytes(b"\xff\xfe\x00binary")
+    store = ChunkStore()
+    store.add_file(str(good))
+    with pytest.raises(UnicodeDecodeError):
+        store.add_file(str(bad))
+    assert len(store) == 1
+    assert store.paths == [str(good)]
+
+
+def test_location_and_slices(tmp_path):
+    path = tmp_path / "file.md"
+    path.write_text("é" * 1500, encoding='utf-8')
+    store = ChunkStore()
+    store.add_file(str(path))
+    assert store.location(0) == (str(path), 0, 2000)
+    assert store.location(1) == (str(path), 2000, 1000)
+    assert store[0:2] == ["é" * 1000, "é" * 500]
+    assert store[-1] == "é" * 500
+    assert store[::-1] == ["é" * 500, "é" * 1000]
+
+
+def test_reads_after_eviction_and_close(tmp_path):
+    store = ChunkStore(max_open_maps=1)
+    for i in range(3):
+        path = tmp_path / f"f{i}.txt"
+        path.write_text(str(i) * 1500)
+        store.add_file(str(path))
+    expected = [str(i) * n for i in range(3) for n in (1000, 500)]
+    assert list(store) == expected
+    assert len(store._maps) == 1
+    store.close()
+    assert store[3] == "1" * 500
@@ -0,0 +1,140 @@
+import os
+import hashlib
+from manifest_utils import (
+    detect_manifests, manifest_kind, parse_requirements, parse_pyproject, parse_setup_cfg,
+    parse_setup_py, parse_package_json, parse_dockerfile, parse_makefile,
+)
+
+
+def write(root, rel, content):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content if isinstance(content, bytes) else content.encode('utf-8'))
+
+
+def test_manifest_kind():
+    assert manifest_kind('requirements-dev.txt') == 'requirements'
+    assert manifest_kind('Requirements.txt') == 'requirements'
+    assert manifest_kind('poetry.lock') == 'lockfile'
+    assert manifest_kind('Dockerfile.prod') == 'Dockerfile'
+    assert manifest_kind('api.Dockerfile') == 'Dockerfile'
+    assert manifest_kind('setup.cfg') == 'setup.cfg'
+    assert manifest_kind('README.md') is None
+    assert manifest_kind('notes.txt') is None
+
+
+def test_parse_requirements():
+    text = "# comment\nrequests>=2.0\n\nflask  # web\n-r base.txt\n"
+    assert parse_requirements(text) == {'requirements': ['requests>=2.0', 'flask', '-r base.txt']}
+
+
+def test_parse_pyproject():
+    text = (
+        '[project]\nname = "pkg"\nrequires-python = ">=3.9"\ndependencies = ["numpy", "httpx"]\n'
+        '[project.optional-dependencies]\ntest = ["pytest"]\n'
+        '[build-system]\nrequires = ["hatchling"]\nbuild-backend = "hatchling.build"\n'
+    )
+    assert parse_pyproject(text) == {
+        'name': 'pkg',
+        'requires_python': '>=3.9',
+        'dependencies': ['numpy', 'httpx'],
+        'optional_dependencies': ['test'],
+        'build_requires': ['hatchling'],
+        'build_backend': 'hatchling.build',
+    }
+
+
+def test_parse_setup_cfg():
+    text = "[options]\npython_requires = >=3.8\ninstall_requires =\n    click\n    attrs>=20\n[options.extras_require]\ndocs = sphinx\n"
+    assert parse_setup_cfg(text) == {
+        'requires_python': '>=3.8',
+        'dependencies': ['click', 'attrs>=20'],
+        'optional_dependencies': ['docs'],
+    }
+
+
+def test_parse_setup_py_handles_dynamic_values():
+    text = "import setuptools\nsetuptools.setup(name='pkg', install_requires=REQS, extras_require={'x': ['y']}, version=v)\n"
+    assert parse_setup_py(text) == {'name': 'pkg', 'install_requires': '<dynamic>', 'extras_require': ['x']}
+
+
+def test_parse_package_json():
+    text = '{"name": "web", "scripts": {"build": "vite build"}, "devDependencies": {"vite": "^5", "eslint": "^9"}, "dependencies": {}}'
+    assert parse_package_json(text) == {'name': 'web', 'scripts': {'build': 'vite build'}, 'dev_dependencies': ['eslint', 'vite']}
+
+
+def test_parse_dockerfile_joins_continuations():
+    text = "FROM python:3.11-slim\nCOPY . /app\nRUN pip install \\\n    -r requirements.txt\nCMD [\"python\", \"main.py\"]\n"
+    assert parse_dockerfile(text) == {'instructions': [
+        'FROM python:3.11-slim', 'RUN pip install -r requirements.txt', 'CMD ["python", "main.py"]',
+    ]}
+
+
+def test_parse_makefile_skips_assignments_and_special_targets():
+    text = "VAR := 1\nall: build\nbuild:\n\tcc main.c\n.PHONY: all build\ntest: build\n"
+    assert parse_makefile(text) == {'targets': ['all', 'build', 'test']}
+
+
+def test_detect_manifests(tmp_path):
+    root = str(tmp_path)
+    write(root, 'requirements.txt', 'requests\n')
+    write(root, 'services/api/pyproject.toml', '[project]\nname = "api"\n')
+    write(root, 'web/package.json', '{"name": "web"}')
+    write(root, 'web/yarn.lock', 'lock contents')
+    write(root, 'web/node_modules/dep/package.json', '{"name": "dep"}')
+    write(root, 'requirements-big.txt', 'x' * 100)
+    write(root, 'requirements-bin.txt', b'\x00\x01binary')
+    write(root, 'Makefile', b'\xff\xfe not utf-8')
+
+    summary = detect_manifests(root, max_bytes=50)
+    by_path = {m.path: m for m in summary.manifests}
+    assert sorted(by_path) == [
+        'Makefile', 'requirements-big.txt', 'requirements-bin.txt', 'requirements.txt',
+        os.path.join('services', 'api', 'pyproject.toml'),
+        os.path.join('web', 'package.json'), os.path.join('web', 'yarn.lock'),
+    ]
+    assert by_path['requirements.txt'].data == {'requirements': ['requests']}
+    assert by_path[os.path.join('services', 'api', 'pyproject.toml')].data == {'name': 'api'}
+    for unparsed in ('Makefile', 'requirements-big.txt', 'requirements-bin.txt', os.path.join('web', 'yarn.lock')):
+        assert not by_path[unparsed].parsed
+        assert by_path[unparsed].data == {}
+    assert by_path['requirements-big.txt'].size == 100
+    assert by_path['requirements-big.txt'].sha256 == hashlib.sha256(b'x' * 50).hexdigest()
+
+
+def test_digest_changes_only_with_manifests(tmp_path):
+    root = str(tmp_path)
+    write(root, 'requirements.txt', 'requests\n')
+    write(root, 'main.py', 'print(1)\n')
+    first = detect_manifests(root).digest()
+    write(root, 'main.py', 'print(2)\n')
+    assert detect_manifests(root).digest() == first
+    write(root, 'requirements.txt', 'requests\nflask\n')
+    assert detect_manifests(root).digest() != first
+
+
+def test_manifest_limit(tmp_path):
+    root = str(tmp_path)
+    for i in range(5):
+        write(root, f'svc{i}/requirements.txt', 'x\n')
+    assert len(detect_manifests(root, max_manifests=3).manifests) == 3
+
+
+def test_symlink_outside_repo_is_not_read(tmp_path):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("SECRET_TOKEN=abc123\n")
+    root = tmp_path / "repo"
+    write(str(root), 'requirements.txt', 'requests\n')
+    os.makedirs(root / "sub")
+    os.symlink(secret, root / "sub" / "requirements.txt")
+    summary = detect_manifests(str(root))
+    assert [m.path for m in summary.manifests] == ['requirements.txt']
+    assert 'SECRET_TOKEN' not in summary.model_dump_json()
+
+
+def test_device_symlink_is_skipped(tmp_path):
+    root = str(tmp_path)
+    os.symlink('/dev/zero', os.path.join(root, 'package.json'))
+    write(root, 'Makefile', 'all:\n')
+    assert [m.path for m in detect_manifests(root).manifests] == ['Makefile']
@@ -0,0 +1,138 @@
+import os
+import sys
+import asyncio
+from chunk_store import ChunkStore
+from models import Hotspot
+import profiling_utils
+from verification_utils import run_sandboxed
+from profiling_utils import aggregate_hotspots, function_end_line, map_to_chunks, profile_repo
+
+SOURCE = '''import functools
+
+
+def slow(n):
+    total = 0
+    for i in range(n):
+        total += i
+    return total
+
+
+@functools.lru_cache()
+def cached(n):
+    return slow(n)
+
+
+def tiny():
+    pass
+'''
+
+
+def write_repo(root):
+    os.makedirs(os.path.join(root, "pkg"))
+    os.makedirs(os.path.join(root, "tests"))
+    with open(os.path.join(root, "pkg", "core.py"), "w") as f:
+        f.write(SOURCE)
+    with open(os.path.join(root, "tests", "test_core.py"), "w") as f:
+        f.write("def test_slow():\n    pass\n")
+
+
+def test_function_end_line(tmp_path):
+    path = tmp_path / "core.py"
+    path.write_text(SOURCE)
+    assert function_end_line(str(path), 4) == 8
+    assert function_end_line(str(path), 11) == 13
+    assert function_end_line(str(path), 16) == 17
+    assert function_end_line(str(path), 1) == 17
+    assert function_end_line(str(path), 6) == 6
+    assert function_end_line(str(tmp_path / "missing.py"), 3) == 3
+
+
+def test_aggregate_hotspots_ranks_repo_functions(tmp_path):
+    root = str(tmp_path)
+    write_repo(root)
+    core = os.path.join(root, "pkg", "core.py")
+    profile = {
+        "functions": [
+            {"file": core, "function": "tiny", "line": 16, "calls": 1, "cumtime": 0.0001, "tottime": 0.0001},
+            {"file": "pkg/core.py", "function": "slow", "line": 4, "calls": 3, "cumtime": 2.0, "tottime": 2.0},
+            {"file": core, "function": "cached", "line": 11, "calls": 3, "cumtime": 1.5, "tottime": 0.1},
+            {"file": os.path.join(root, "tests", "test_core.py"), "function": "test_slow", "line": 1, "calls": 1, "cumtime": 5.0, "tottime": 0.0},
+            {"file": os.__file__, "function": "fspath", "line": 1, "calls": 9, "cumtime": 9.0, "tottime": 9.0},
+        ],
+        "function_samples": [[core, 4, 40], [core, 11, 30]],
+        "line_samples": [[core, 6, 5], [core, 7, 30], [core, 5, 1], [core, 8, 2], [core, 13, 30]],
+    }
+    hotspots = aggregate_hotspots(root, profile)
+    assert [(h.function, h.file) for h in hotspots] == [
+        ("slow", os.path.join("pkg", "core.py")), ("cached", os.path.join("pkg", "core.py")),
+    ]
+    slow, cached = hotspots
+    assert (slow.start_line, slow.end_line, slow.samples, slow.calls) == (4, 8, 40, 3)
+    assert slow.hot_lines == [7, 6, 8]
+    assert (cached.start_line, cached.end_line, cached.hot_lines) == (11, 13, [13])
+    assert slow.chunk_ids == []
+
+
+def test_map_to_chunks(tmp_path):
+    root = str(tmp_path)
+    write_repo(root)
+    store = ChunkStore()
+    store.add_file(os.path.join(root, "pkg", "core.py"), chunk_size=60)
+    hotspots = [
+        Hotspot(file=os.path.join("pkg", "core.py"), function="slow", start_line=4, end_line=8, calls=1, cumtime=1.0, tottime=1.0),
+        Hotspot(file=os.path.join("pkg", "core.py"), function="tiny", start_line=16, end_line=17, calls=1, cumtime=1.0, tottime=1.0),
+    ]
+    map_to_chunks(root, hotspots, store)
+    for hotspot in hotspots:
+        text = "".join(store[i] for i in hotspot.chunk_ids)
+        body = "".join(SOURCE.splitlines(keepends=True)[hotspot.start_line - 1:hotspot.end_line])
+        assert body in text
+        assert hotspot.chunk_ids == sorted(hotspot.chunk_ids)
+    assert hotspots[0].chunk_ids[0] == 0 and hotspots[1].chunk_ids[0] > 0
+    assert hotspots[1].chunk_ids[-1] == len(store) - 1
+
+
+def test_run_sandboxed_kills_command_that_ignores_sigterm(tmp_path):
+    script = "import signal, time\nsignal.signal(signal.SIGTERM, signal.SIG_IGN)\nprint('started', flush=True)\ntime.sleep(60)\n"
+    returncode, output, seconds = asyncio.run(run_sandboxed([sys.executable, "-c", script], str(tmp_path), timeout=1, grace=1))
+    assert returncode is None
+    assert "started" in output and "Timed out after 1s" in output
+    assert seconds < 10
+
+
+def test_run_sandboxed_cpu_limit_leaves_time_to_handle_sigterm(tmp_path):
+    # Burns CPU until the timeout, then needs more CPU time to save its results
+    script = (
+        "import os, signal, time\n"
+        "def save(signum, frame):\n"
+        "    end = time.process_time() + 0.5\n"
+        "    while time.process_time() < end:\n"
+        "        pass\n"
+        "    print('saved', flush=True)\n"
+        "    os._exit(1)\n"
+        "signal.signal(signal.SIGTERM, save)\n"
+        "while True:\n"
+        "    pass\n"
+    )
+    returncode, output, _ = asyncio.run(run_sandboxed([sys.executable, "-c", script], str(tmp_path), timeout=2, grace=3))
+    assert returncode is None
+    assert "saved" in output
+
+
+def test_profile_repo_keeps_partial_profile_of_cpu_bound_run(tmp_path):
+    root = str(tmp_path)
+    write_repo(root)
+    with open(os.path.join(root, "run.py"), "w") as f:
+        f.write("from pkg.core import slow\nwhile True:\n    slow(1000)\n")
+    hotspots = asyncio.run(profile_repo(root, ["run.py"], timeout=2))
+    assert "slow" in [h.function for h in hotspots]
+
+
+def test_profile_repo_ignores_truncated_results(tmp_path, monkeypatch):
+    async def truncated_run(argv, cwd, timeout):
+        with open(argv[2], "w") as f:
+            f.write('{"functions": [{"file": "pkg')
+        return None, "", 1.0
+
+    monkeypatch.setattr(profiling_utils, "run_sandboxed", truncated_run)
+    assert asyncio.run(profile_repo(str(tmp_path), timeout=1)) == []
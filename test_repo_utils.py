@@ -0,0 +1,49 @@
+import os
+import asyncio
+from chunk_store import ChunkStore
+from repo_utils import stream_knowledge_base, create_knowledge_base
+
+
+def make_tree(root):
+    for rel, content in {
+        "a.py": "a" * 1500,
+        "skip.bin": "ignored",
+        "pkg/b.md": "b",
+        "pkg/sub/c.txt": "c" * 10,
+        "pkg/sub/d.js": "d",
+        "z/e.py": "e",
+    }.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+
+def walk_order(root):
+    return [
+        os.path.join(r, f)
+        for r, _, files in os.walk(root)
+        for f in files
+        if f.endswith(('.py', '.md', '.txt', '.js'))
+    ]
+
+
+async def collect(aiter):
+    return [item async for item in aiter]
+
+
+def test_stream_knowledge_base_follows_os_walk_order(tmp_path):
+    make_tree(str(tmp_path))
+    store = ChunkStore()
+    chunks = asyncio.run(collect(stream_knowledge_base(str(tmp_path), store)))
+    assert store.paths == walk_order(str(tmp_path))
+    assert chunks == list(store)
+    assert chunks[:2] == ["a" * 1000, "a" * 500]
+
+
+def test_stream_knowledge_base_skips_unreadable_files(tmp_path):
+    make_tree(str(tmp_path))
+    (tmp_path / "bad.py").write_bytes(b"\xff\xfe")
+    store = asyncio.run(create_knowledge_base(str(tmp_path)))
+    assert str(tmp_path / "bad.py") not in store.paths
+    assert len(store) == 6
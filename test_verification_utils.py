@@ -0,0 +1,105 @@
+import sys
+import asyncio
+import git
+import pytest
+from models import ImplementationInstructions, Measurement, Suggestion, VerificationResult
+from verification_utils import branch_name, best_measurement, run_sandboxed, verify_suggestions, _apply_changes, _remove_worktree
+
+SLOW = "import time\ntime.sleep(0.3)\n"
+SPEEDUP_DIFF = """diff --git a/work.py b/work.py
+--- a/work.py
++++ b/work.py
+@@ -1,2 +1,2 @@
+ import time
+-time.sleep(0.3)
++time.sleep(0.01)
+"""
+FAILING_DIFF = """diff --git a/work.py b/work.py
+--- a/work.py
++++ b/work.py
+@@ -1,2 +1,2 @@
+ import time
+-time.sleep(0.3)
++raise SystemExit(1)
+"""
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    for var in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(var, "test")
+    for var in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(var, "test@example.com")
+    path = tmp_path / "repo"
+    path.mkdir()
+    (path / "work.py").write_text(SLOW)
+    r = git.Repo.init(path)
+    r.git.add("-A")
+    r.git.commit("-m", "initial")
+    return r
+
+
+def instructions(title, code_changes):
+    suggestion = Suggestion(title=title, description="", estimated_impact="high", score=0.5)
+    return ImplementationInstructions(suggestion=suggestion, steps=[], code_changes=code_changes)
+
+
+def test_branch_name():
+    assert branch_name("Use a faster JSON parser!") == "implement-use-a-faster-json-parser"
+    assert branch_name("???") == "implement-suggestion"
+
+
+def test_best_measurement_prefers_failures_then_fastest():
+    fast, slow = Measurement(passed=True, seconds=1.0), Measurement(passed=True, seconds=2.0)
+    failed = Measurement(passed=False)
+    assert best_measurement(None, slow) is slow
+    assert best_measurement(slow, fast) is fast
+    assert best_measurement(fast, slow) is fast
+    assert best_measurement(fast, failed) is failed
+    assert best_measurement(failed, fast) is failed
+
+
+def test_non_diff_changes_are_rejected(repo):
+    with pytest.raises(ValueError, match="not a unified diff"):
+        _apply_changes(repo.working_dir, instructions("Rewrite", "def work():\n    pass\n"))
+    assert not repo.is_dirty(untracked_files=True)
+
+
+def test_verify_suggestions_keeps_only_verified_speedups(repo):
+    command = [sys.executable, "work.py"]
+    results = asyncio.run(verify_suggestions(repo.working_dir, [
+        instructions("Sleep less", SPEEDUP_DIFF),
+        instructions("Break it", FAILING_DIFF),
+        instructions("Not a diff", "time.sleep(0)"),
+    ], command=command, max_parallel=3))
+    faster, broken, not_diff = results
+
+    assert faster.kept and faster.speedup > 2
+    assert faster.baseline.passed and faster.after.passed
+    assert broken.applied and not broken.kept and not broken.after.passed
+    assert not not_diff.applied and not not_diff.kept and "not a unified diff" in not_diff.error
+
+    heads = {h.name for h in repo.heads}
+    assert faster.branch in heads
+    assert broken.branch not in heads and not_diff.branch not in heads
+    assert len(repo.git.worktree("list").splitlines()) == 1
+
+
+def test_summary_of_error_without_message():
+    result = VerificationResult(title="t", branch="b", error=str(TimeoutError()))
+    assert result.summary() == "Failed to implement suggestion: t. Error: "
+
+
+def test_remove_worktree_logs_branch_deletion_errors(repo, tmp_path):
+    path = str(tmp_path / "wt")
+    repo.git.worktree("add", "-b", "implement-x", path, "HEAD")
+    # The worktree cannot be removed from outside, so the branch stays checked out
+    _remove_worktree(repo.working_dir, str(tmp_path / "elsewhere"), "implement-x")
+    assert "implement-x" in {h.name for h in repo.heads}
+
+
+def test_run_sandboxed_applies_cpu_limit(tmp_path):
+    script = "import resource; print(resource.getrlimit(resource.RLIMIT_CPU))"
+    returncode, output, _ = asyncio.run(run_sandboxed([sys.executable, "-c", script], str(tmp_path), timeout=30, grace=5))
+    assert returncode == 0
+    assert output.strip() == "(70, 70)"
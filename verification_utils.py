@@ -0,0 +1,249 @@
+import os
+import re
+import sys
+import json
+import math
+import signal
+import shutil
+import asyncio
+import logging
+import tempfile
+import importlib.util
+from typing import List, Optional, Sequence, Tuple
+import git
+from models import ImplementationInstructions, Measurement, VerificationResult
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+TEST_TIMEOUT = 600
+TIMING_REPEATS = 3
+MIN_SPEEDUP = 1.02
+OUTPUT_TAIL = 2000
+TERMINATE_GRACE = 5
+DIFF_RE = re.compile(r'^(diff --git |--- )', re.MULTILINE)
+# Sets the CPU limit in the child and execs the command. preexec_fn would do
+# the same but is unsafe while other threads run, which to_thread makes common
+LIMIT_CPU = "import os, sys, resource; n = int(sys.argv[1]); resource.setrlimit(resource.RLIMIT_CPU, (n, n)); os.execvp(sys.argv[2], sys.argv[2:])"
+
+# Worktree and branch bookkeeping lives in shared files under .git, so
+# commands that touch it are serialized; tests in the worktrees run in parallel
+git_lock = asyncio.Lock()
+
+def branch_name(title: str) -> str:
+    return "implement-" + (re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-') or "suggestion")
+
+async def run_sandboxed(command: Sequence[str], cwd: str, timeout: int = TEST_TIMEOUT, grace: float = TERMINATE_GRACE, cpu_limit: Optional[int] = None) -> Tuple[Optional[int], str, float]:
+    """Run an untrusted command and return (exit code, output tail, seconds).
+
+    The command gets a minimal environment without API keys, its own process
+    group, and a CPU limit. On timeout the group gets SIGTERM, then SIGKILL
+    after grace seconds, and the exit code is None.
+
+    The CPU limit (default: twice timeout plus grace) only backs up the wall
+    clock timeout; it must not fire first, or a CPU-bound command is killed
+    before its SIGTERM handler can save partial results.
+    """
+    env = {
+        'PATH': os.environ.get('PATH', ''),
+        'HOME': cwd,
+        'LANG': 'C.UTF-8',
+        'PYTHONDONTWRITEBYTECODE': '1',
+        'PYTHONHASHSEED': '0',
+    }
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    if resource is not None:
+        cpu_limit = cpu_limit or math.ceil(2 * (timeout + grace))
+        command = [sys.executable, '-c', LIMIT_CPU, str(cpu_limit), *command]
+    proc = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd,
+        env=env,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        start_new_session=True,
+    )
+    communicate = asyncio.ensure_future(proc.communicate())
+    try:
+        output, _ = await asyncio.wait_for(asyncio.shield(communicate), timeout)
+    except BaseException as e:
+        if not isinstance(e, asyncio.TimeoutError):
+            _killpg(proc.pid, signal.SIGKILL)
+            communicate.cancel()
+            await proc.wait()
+            raise
+        _killpg(proc.pid, signal.SIGTERM)
+        try:
+            output, _ = await asyncio.wait_for(asyncio.shield(communicate), grace)
+        except asyncio.TimeoutError:
+            # Still shielded, so the reader keeps the output read so far
+            _killpg(proc.pid, signal.SIGKILL)
+            output, _ = await communicate
+        output = output.decode('utf-8', errors='replace')[-OUTPUT_TAIL:]
+        return None, f"{output}\nTimed out after {timeout}s", loop.time() - start
+    return proc.returncode, output.decode('utf-8', errors='replace')[-OUTPUT_TAIL:], loop.time() - start
+
+def _killpg(pid: int, sig: int) -> None:
+    try:
+        os.killpg(pid, sig)
+    except ProcessLookupError:
+        pass
+
+async def measure_once(path: str, command: Optional[Sequence[str]] = None, timeout: int = TEST_TIMEOUT) -> Measurement:
+    """Run the test command in path once and time it.
+
+    Without an explicit command the repo's pytest suite is run; when
+    pytest-benchmark is available its results are used instead of the wall
+    clock time of the whole run.
+    """
+    benchmark_json = None
+    if command is None:
+        command = [sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider']
+        if importlib.util.find_spec('pytest_benchmark') is not None:
+            fd, benchmark_json = tempfile.mkstemp(suffix='.json', prefix='forker-benchmark-')
+            os.close(fd)
+            command = command + [f'--benchmark-json={benchmark_json}']
+    try:
+        returncode, output, seconds = await run_sandboxed(command, path, timeout)
+        if returncode == 5:  # pytest found no tests, nothing to time
+            return Measurement(passed=True, output=output)
+        if returncode != 0:
+            return Measurement(passed=False, output=output)
+        benchmark_seconds = read_benchmark_seconds(benchmark_json)
+        if benchmark_seconds is not None:
+            return Measurement(passed=True, seconds=benchmark_seconds, source="pytest-benchmark", output=output)
+        return Measurement(passed=True, seconds=seconds, output=output)
+    finally:
+        if benchmark_json:
+            os.remove(benchmark_json)
+
+def best_measurement(best: Optional[Measurement], measurement: Measurement) -> Measurement:
+    """Combine repeated runs: any failure or untimed run wins, otherwise the fastest run."""
+    if best is None:
+        return measurement
+    if not best.passed or best.seconds is None:
+        return best
+    if not measurement.passed or measurement.seconds is None:
+        return measurement
+    return measurement if measurement.seconds < best.seconds else best
+
+async def measure_pair(baseline_path: str, path: str, command: Optional[Sequence[str]] = None, repeats: int = TIMING_REPEATS, timeout: int = TEST_TIMEOUT) -> Tuple[Measurement, Measurement]:
+    """Time the unmodified tree and the changed tree with alternating runs.
+
+    Alternating means both sides run under the same machine load, whatever
+    else is running concurrently, so their ratio is not biased by it. The
+    best of repeats runs is reported for each side.
+    """
+    baseline = after = None
+    for _ in range(repeats):
+        baseline = best_measurement(baseline, await measure_once(baseline_path, command, timeout))
+        after = best_measurement(after, await measure_once(path, command, timeout))
+        if baseline.seconds is None or after.seconds is None:
+            break  # A failed or untimed run will not become comparable by repeating it
+    return baseline, after
+
+def read_benchmark_seconds(path: Optional[str]) -> Optional[float]:
+    """Sum of per-benchmark minimum times from a pytest-benchmark JSON report."""
+    if not path or not os.path.getsize(path):
+        return None
+    with open(path) as f:
+        benchmarks = json.load(f).get('benchmarks', [])
+    if not benchmarks:
+        return None
+    return sum(b['stats']['min'] for b in benchmarks)
+
+def _add_worktree(repo_path: str, path: str, branch: Optional[str] = None) -> None:
+    repo = git.Repo(repo_path)
+    if branch:
+        repo.git.worktree('add', '-b', branch, path, 'HEAD')
+    else:
+        repo.git.worktree('add', '--detach', path, 'HEAD')
+
+def _remove_worktree(repo_path: str, path: str, branch: Optional[str] = None) -> None:
+    repo = git.Repo(repo_path)
+    try:
+        repo.git.worktree('remove', '--force', path)
+    except git.GitCommandError as e:
+        logger.warning(f"Error removing worktree {path}: {str(e)}")
+    try:
+        if branch and branch in repo.heads:
+            repo.git.branch('-D', branch)
+    except git.GitCommandError as e:
+        logger.warning(f"Error deleting branch {branch}: {str(e)}")
+
+def _apply_changes(path: str, instructions: ImplementationInstructions) -> None:
+    repo = git.Repo(path)
+    changes = instructions.code_changes or ""
+    if DIFF_RE.search(changes):
+        with tempfile.NamedTemporaryFile('w', suffix='.patch', delete=False) as f:
+            f.write(changes if changes.endswith('\n') else changes + '\n')
+        try:
+            repo.git.apply('--whitespace=nowarn', f.name)
+        finally:
+            os.remove(f.name)
+    elif changes:
+        raise ValueError("Code changes are not a unified diff")
+    else:
+        raise ValueError("Suggestion contains no code changes")
+    repo.git.add('-A')
+    repo.git.commit('-m', f"Implement performance improvement: {instructions.suggestion.title}")
+
+async def verify_suggestion(repo_path: str, instructions: ImplementationInstructions, branch: str, worktree_root: str, semaphore: asyncio.Semaphore, command: Optional[Sequence[str]] = None, timeout: int = TEST_TIMEOUT, min_speedup: float = MIN_SPEEDUP) -> VerificationResult:
+    """Apply one suggestion in its own worktree and time it against an unmodified worktree.
+
+    The branch is kept only if the diff applies, the tests pass and the
+    speedup is at least min_speedup; otherwise it is deleted along with the
+    worktrees.
+    """
+    result = VerificationResult(title=instructions.suggestion.title, branch=branch)
+    path = os.path.join(worktree_root, branch)
+    baseline_path = os.path.join(worktree_root, f"{branch}-baseline")
+    try:
+        async with git_lock:
+            await asyncio.to_thread(_add_worktree, repo_path, path, branch)
+            await asyncio.to_thread(_add_worktree, repo_path, baseline_path)
+        await asyncio.to_thread(_apply_changes, path, instructions)
+        result.applied = True
+        async with semaphore:
+            result.baseline, result.after = await measure_pair(baseline_path, path, command, timeout=timeout)
+        if result.baseline.passed and result.baseline.seconds and result.after.passed and result.after.seconds:
+            result.speedup = result.baseline.seconds / result.after.seconds
+        result.kept = result.speedup is not None and result.speedup >= min_speedup
+    except Exception as e:
+        logger.error(f"Error verifying suggestion {result.title}: {str(e)}")
+        result.error = str(e)
+    finally:
+        async with git_lock:
+            await asyncio.to_thread(_remove_worktree, repo_path, baseline_path)
+            await asyncio.to_thread(_remove_worktree, repo_path, path, None if result.kept else branch)
+    return result
+
+async def verify_suggestions(repo_path: str, instructions_list: List[ImplementationInstructions], command: Optional[Sequence[str]] = None, timeout: int = TEST_TIMEOUT, max_parallel: Optional[int] = None) -> List[VerificationResult]:
+    """Verify all suggestions concurrently.
+
+    At most max_parallel suggestions (default: CPU count) are timed at once.
+    Each is timed against its own unmodified worktree in alternation, so
+    the speedup compares runs made under the same load.
+    """
+    worktree_root = tempfile.mkdtemp(prefix='forker-worktrees-')
+    try:
+        branches = []
+        for instructions in instructions_list:
+            branch = branch_name(instructions.suggestion.title)
+            while branch in branches:
+                branch += "-2"
+            branches.append(branch)
+        semaphore = asyncio.Semaphore(max_parallel or os.cpu_count() or 1)
+        return await asyncio.gather(*[
+            verify_suggestion(repo_path, instructions, branch, worktree_root, semaphore, command, timeout)
+            for instructions, branch in zip(instructions_list, branches)
+        ])
+    finally:
+        shutil.rmtree(worktree_root, ignore_errors=True)